@@ -0,0 +1,177 @@
+"""Dynamic micro-batching: aynı anda gelen istekleri kısa bir pencere boyunca toplayıp tek forward pass'te işler"""
+
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from ai.cache import mask_cache
+from ai.main import load_image, remove_background_batch
+from ai.metrics import REGISTRY
+from ai.workers import INFERENCE_MAX_IN_FLIGHT
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))          # bir forward pass'e girecek en fazla resim sayısı
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10")) # ilk istekten sonra batch'i doldurmak için beklenecek en uzun süre
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))           # zamanlayıcıda bekleyebilecek en fazla resim
+INFERENCE_DEADLINE_MS = float(os.getenv("INFERENCE_DEADLINE_MS", "30000"))  # tahmini bekleme bunu aşacaksa istek baştan reddedilir
+
+QUEUE_WAIT_SECONDS = REGISTRY.histogram("inference_queue_wait_seconds", "Time images wait in the batch scheduler before inference")
+REJECTED = REGISTRY.counter("inference_rejected_total", "Images rejected or shed by admission control", labels=("reason",))
+
+
+class Overloaded(RuntimeError):
+    """Zamanlayıcı isteği kabul edemedi ya da son süresi dolduğu için attı; retry_after saniye sonra tekrar denenebilir"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BatchScheduler:
+    """
+    Uzun ömürlü batch zamanlayıcısı. submit() ile gelen resimleri kuyruğa alır, arka plandaki thread'ler
+    max_batch_size dolana ya da max_wait_ms geçene kadar bekleyip hepsini remove_background_batch ile
+    birlikte işler. Her çağıran kendi Future'ı üzerinden kendi RGBA sonucunu alır.
+
+    Kabul kontrolü (admission control): aynı anda en fazla max_in_flight batch modelden geçer (torch thread'leri
+    aşırı paylaşılmasın), kuyrukta en fazla max_queue resim bekler. Tahmini bekleme isteğin son süresini (deadline)
+    aşacaksa istek hemen Overloaded ile reddedilir; kuyrukta beklerken son süresi dolan istek modele hiç girmez.
+    Yük altında herkesin birlikte zaman aşımına uğraması yerine bir kısım istek hızlıca "sonra tekrar dene" alır.
+    """
+
+    def __init__(self, model, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, cache=mask_cache,
+                 max_in_flight=INFERENCE_MAX_IN_FLIGHT, max_queue=INFERENCE_MAX_QUEUE):
+        self.model = model
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max_queue
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._running = 0           # şu an modelden geçen resim sayısı
+        self._reserved = 0          # kabul edilmiş, çağıranın thread'inde açılıp kuyruğa girmeyi bekleyen resim sayısı
+        self._image_seconds = None  # resim başına işlem süresinin hareketli ortalaması (bekleme tahmini için)
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, name=f"batch-scheduler-{index}", daemon=True)
+                         for index in range(self.max_in_flight)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, input_source, deadline_ms=INFERENCE_DEADLINE_MS):
+        if self._closed:
+            raise RuntimeError("BatchScheduler is closed")
+
+        future = Future()
+        deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+        with self._lock:
+            reason = None
+            if self._queue.qsize() + self._reserved >= self.max_queue:
+                reason = "queue_full"
+            elif deadline is not None and time.monotonic() + self.estimated_wait() > deadline:
+                reason = "deadline"
+            if reason is not None:
+                REJECTED.inc(reason=reason)
+                future.set_exception(Overloaded(f"Inference is overloaded ({reason})", self.retry_after()))
+                return future
+            # kuyruktaki yer resim açılmadan ayrılır: kontrol ile put arasında aynı anda gelenler max_queue'yu aşamasın
+            self._reserved += 1
+
+        # resmi çağıranın thread'inde açıyoruz; bozuk bir dosya sadece kendi isteğini düşürsün, batch'i değil
+        try:
+            image = load_image(input_source)
+        except Exception as e:
+            with self._lock:
+                self._reserved -= 1
+            future.set_exception(e)
+            return future
+
+        with self._lock:
+            self._queue.put((image, future, time.monotonic(), deadline))
+            self._reserved -= 1
+        return future
+
+    # kuyrukta batch'e alınmayı bekleyen resim sayısı
+    def pending(self):
+        return self._queue.qsize()
+
+    def estimated_wait(self, extra=0):
+        """Şimdi (ve extra resim daha) sıraya giren bir resmin modele girene kadar tahmini bekleme süresi (saniye)"""
+        if self._image_seconds is None:
+            return 0.0
+        return (self._queue.qsize() + self._reserved + self._running + extra) * self._image_seconds / self.max_in_flight
+
+    def retry_after(self, extra=0):
+        return max(1, math.ceil(self.estimated_wait(extra)))
+
+    def remove_background(self, input_source, timeout=None, deadline_ms=INFERENCE_DEADLINE_MS):
+        return self.submit(input_source, deadline_ms).result(timeout=timeout)
+
+    def close(self):
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _collect(self):
+        # ilk isteği bekle, sonra pencere kapanana ya da batch dolana kadar diğerlerini topla
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None) # kapanma sinyalini kaybetme, bu batch bitince döngü dursun
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # iptal edilmiş istekleri ve kuyrukta beklerken son süresi dolanları modele sokmuyoruz
+            now = time.monotonic()
+            admitted = []
+            for image, future, queued_at, deadline in batch:
+                if deadline is not None and now > deadline:
+                    REJECTED.inc(reason="expired")
+                    future.set_exception(Overloaded("Deadline exceeded while waiting for inference", self.retry_after()))
+                elif future.set_running_or_notify_cancel():
+                    QUEUE_WAIT_SECONDS.observe(now - queued_at)
+                    admitted.append((image, future))
+            if not admitted:
+                continue
+
+            images = [image for image, _ in admitted]
+            with self._lock:
+                self._running += len(images)
+            start = time.perf_counter()
+            try:
+                results = remove_background_batch(self.model, images, cache=self.cache)
+            except Exception as e:
+                for _, future in admitted:
+                    future.set_exception(e)
+                continue
+            finally:
+                with self._lock:
+                    self._running -= len(images)
+                    seconds = (time.perf_counter() - start) / len(images)
+                    self._image_seconds = seconds if self._image_seconds is None else 0.8 * self._image_seconds + 0.2 * seconds
+
+            for (_, future), result in zip(admitted, results):
+                future.set_result(result)
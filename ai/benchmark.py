@@ -0,0 +1,294 @@
+"""
+Arkaplan kaldırma hattı için ağ bağlantısı gerektirmeyen benchmark.
+
+Aynı DeepLabV3-MobileNetV3 mimarisi rastgele ağırlıklarla kurulur (indirme yok), 256px'ten 4K'ya kadar farklı boyut,
+en-boy oranı ve formatta (JPEG/PNG/WebP) sentetik resimler üretilir. Her senaryo için aşama (decode, resize,
+preprocess, forward, postprocess, composite, encode) ve toplam süreler p50/p95/p99 olarak, ayrıca throughput ve
+en yüksek RSS raporlanır. Sonuçlar commit'ler arası karşılaştırma için JSON'a yazılır.
+
+Kullanım:
+    python -m ai.benchmark --output bench.json
+    python -m ai.benchmark --sizes 512x512,3840x2160 --formats jpeg --backends eager,onnx --batch-sizes 1,4
+    python -m ai.benchmark --compare before.json after.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from PIL import Image
+from torchvision.models.segmentation import deeplabv3_mobilenet_v3_large
+
+from ai import runtimes
+from ai.batching import BatchScheduler
+from ai.encoding import encode_image
+from ai.foreground import ForegroundSegmentation
+from ai.main import remove_background, remove_background_batch
+from ai.preprocess import Preprocessor
+from ai.timing import stage
+
+# 256'dan 4K'ya; kare, yatay (4:3, 16:9) ve dikey (3:4, 9:16) oranlar
+DEFAULT_SIZES = "256x256,512x384,768x1024,720x1280,1920x1080,2048x1536,3840x2160"
+DEFAULT_FORMATS = "jpeg,png,webp"
+STAGES = ("decode", "resize", "preprocess", "forward", "postprocess", "composite", "encode")
+
+
+# düz renk yerine gradyan + şekil + gürültü: sıkıştırma ve decode süreleri gerçek fotoğraflara yakın olsun
+def synthetic_image(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    pixels = np.stack([x / width * 255, y / height * 255, (x + y) / (width + height) * 255], axis=-1)
+    cy, cx, radius = height / 2, width / 2, min(width, height) / 3
+    pixels[(x - cx) ** 2 + (y - cy) ** 2 < radius ** 2] = rng.integers(0, 255, 3)
+    pixels += rng.normal(0, 8, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def encode_source(image, image_format):
+    buf = io.BytesIO()
+    image.save(buf, format=image_format.upper(), **({"quality": 90} if image_format != "png" else {}))
+    return buf.getvalue()
+
+
+def random_model(foreground_head=False):
+    torch.manual_seed(0)
+    model = deeplabv3_mobilenet_v3_large(weights=None, weights_backbone=None, num_classes=21, aux_loss=False).eval()
+    return ForegroundSegmentation(model) if foreground_head else model
+
+
+def build_model(backend, foreground_head=False):
+    model = random_model(foreground_head)
+    model.preprocessor = Preprocessor("cpu")
+    return runtimes.build_engine(model, backend, "cpu")
+
+
+class PeakRss:
+    """Senaryo boyunca /proc/self/statm'den RSS'i örnekleyip en yüksek değeri tutar (Linux dışında ru_maxrss)"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    @staticmethod
+    def current():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    return {"p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2)}
+
+
+def _summary(samples, images, wall, rss):
+    stages = {name: percentiles([sample.get(name, 0.0) for sample in samples]) for name in STAGES}
+    return {
+        "total": percentiles([sample["total"] for sample in samples]),
+        "stages": stages,
+        "throughput_ips": round(images / wall, 2),
+        "peak_rss_mb": round(rss.peak / 1024 / 1024, 1),
+    }
+
+
+# tek resim yolu: remove_background + encode, her iterasyon bir örnek
+def bench_single(model, data, iterations, output_format):
+    remove_background(model, io.BytesIO(data), cache=None) # ısınma
+    samples = []
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            timings = {}
+            begin = time.perf_counter()
+            result = remove_background(model, io.BytesIO(data), timings, cache=None)
+            with stage(timings, "encode"):
+                encode_image(result, output_format)
+            timings["total"] = time.perf_counter() - begin
+            samples.append(timings)
+        wall = time.perf_counter() - start
+    return _summary(samples, iterations, wall, rss)
+
+
+# batch yolu: aynı boyutta batch_size resim tek remove_background_batch çağrısında, her batch bir örnek
+def bench_batch(model, data, iterations, output_format, batch_size):
+    remove_background_batch(model, [io.BytesIO(data)] * batch_size, cache=None)
+    samples = []
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            timings = {}
+            begin = time.perf_counter()
+            results = remove_background_batch(model, [io.BytesIO(data) for _ in range(batch_size)], timings, cache=None)
+            with stage(timings, "encode"):
+                for result in results:
+                    encode_image(result, output_format)
+            timings["total"] = time.perf_counter() - begin
+            samples.append(timings)
+        wall = time.perf_counter() - start
+    return _summary(samples, iterations * batch_size, wall, rss)
+
+
+# BatchScheduler yolu: concurrency kadar istemci aynı anda istek atar; aşama süreleri scheduler'ın içinde kaldığı için
+# sadece uçtan uca gecikme ölçülür
+def bench_scheduler(model, data, iterations, output_format, concurrency):
+    scheduler = BatchScheduler(model, cache=None)
+
+    def request():
+        begin = time.perf_counter()
+        result = scheduler.remove_background(io.BytesIO(data))
+        encode_image(result, output_format)
+        return {"total": time.perf_counter() - begin}
+
+    try:
+        request()
+        total = iterations * concurrency
+        with PeakRss() as rss, ThreadPoolExecutor(concurrency) as pool:
+            start = time.perf_counter()
+            samples = list(pool.map(lambda _: request(), range(total)))
+            wall = time.perf_counter() - start
+    finally:
+        scheduler.close()
+    summary = _summary(samples, total, wall, rss)
+    del summary["stages"]
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_result(scenario, result):
+    print(f"{scenario['backend']:<18}{scenario['size']:>10} {scenario['format']:<5} {result['path']:<12}"
+          f"p50 {result['total']['p50_ms']:>9} ms  {result['throughput_ips']:>7} img/s  {result['peak_rss_mb']:>7} MB")
+
+
+def run(sizes, formats, backends, batch_sizes, concurrency, iterations, output_format, foreground_head):
+    # rastgele ağırlıklı export'lar gerçek modelin dönüştürülmüş dosyalarının üzerine yazılmasın
+    runtimes.RUNTIME_DIR = tempfile.mkdtemp(prefix="benchmark-runtimes-")
+
+    results = []
+    for backend in backends:
+        model = build_model(backend, foreground_head)
+        for width, height in sizes:
+            image = synthetic_image(width, height)
+            for image_format in formats:
+                data = encode_source(image, image_format)
+                scenario = {"backend": backend, "size": f"{width}x{height}", "format": image_format, "bytes": len(data)}
+
+                for batch_size in batch_sizes:
+                    if batch_size == 1:
+                        result = {"path": "single", **bench_single(model, data, iterations, output_format)}
+                    else:
+                        result = {"path": f"batch{batch_size}", **bench_batch(model, data, iterations, output_format, batch_size)}
+                    results.append({**scenario, **result})
+                    _print_result(scenario, result)
+
+                if concurrency > 1:
+                    result = {"path": f"scheduler{concurrency}", **bench_scheduler(model, data, iterations, output_format, concurrency)}
+                    results.append({**scenario, **result})
+                    _print_result(scenario, result)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "iterations": iterations,
+            "output_format": output_format,
+            "foreground_head": foreground_head,
+        },
+        "results": results,
+    }
+
+
+# iki JSON sonucunu senaryo bazında karşılaştırır: toplam ve aşama p50'lerindeki değişim yüzdesi
+def compare(before, after):
+    def key(result):
+        return result["backend"], result["size"], result["format"], result["path"]
+
+    baseline = {key(result): result for result in before["results"]}
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    for result in after["results"]:
+        old = baseline.get(key(result))
+        if old is None:
+            continue
+        changes = []
+        for name in ("total",) + STAGES:
+            new_value = result["total"] if name == "total" else result.get("stages", {}).get(name)
+            old_value = old["total"] if name == "total" else old.get("stages", {}).get(name)
+            if new_value and old_value and old_value["p50_ms"] > 0:
+                changes.append(f"{name} {100 * (new_value['p50_ms'] / old_value['p50_ms'] - 1):+.0f}%")
+        print(f"{' '.join(key(result))}: {', '.join(changes)}")
+
+
+def _parse_sizes(value):
+    return [tuple(int(part) for part in size.lower().split("x")) for size in value.split(",") if size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the background removal pipeline (random weights)")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated WIDTHxHEIGHT list")
+    parser.add_argument("--formats", default=DEFAULT_FORMATS, help="input formats: jpeg,png,webp")
+    parser.add_argument("--backends", default="eager", help=f"comma separated, any of {','.join(runtimes.BACKENDS)}")
+    parser.add_argument("--batch-sizes", default="1,4", help="1 = single image path, >1 = remove_background_batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent clients for the BatchScheduler path (<=1 skips it)")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--output-format", default="png", help="png, webp or mask, used for the encode stage")
+    parser.add_argument("--foreground-head", action="store_true", help="benchmark the single channel foreground head")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two JSON result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as before, open(args.compare[1]) as after:
+            compare(json.load(before), json.load(after))
+        return
+
+    report = run(_parse_sizes(args.sizes), [f for f in args.formats.split(",") if f], [b for b in args.backends.split(",") if b],
+                 [int(b) for b in args.batch_sizes.split(",") if b], args.concurrency, args.iterations,
+                 args.output_format, args.foreground_head)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
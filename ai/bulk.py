@@ -0,0 +1,257 @@
+"""
+Klasör, glob ya da zip içindeki çok sayıda resmin arkaplanını komut satırından kaldırır.
+
+Girdiler akış halinde okunur (liste önceden belleğe alınmaz), işler bir process havuzuna dağıtılır; her worker kendi
+modelini bir kere kurar ve torch'u sınırlı sayıda thread ile çalıştırır. Aynı anda havuzda bekleyen resim sayısı
+--max-in-flight ile sınırlı olduğu için bellek kuyruktaki dosya sayısından bağımsızdır. Sonuçlar bittikçe diske yazılır
+ve tamamlanan her resmin sha256'sı çıktı yoluyla birlikte çıktı klasöründeki manifest'e eklenir; yarıda kalan bir
+çalıştırma aynı komutla tekrar başlatılınca bitmiş resimler atlanır. Daha önce işlenmiş bir içerik başka bir isimle
+gelirse model tekrar çalıştırılmaz, bitmiş çıktı yeni yola kopyalanır.
+
+Kullanım:
+    python -m ai.bulk photos/ --output out/
+    python -m ai.bulk "catalog/**/*.jpg" archive.zip --output out/ --workers 4 --format webp
+"""
+
+import argparse
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from ai.workers import available_cpus, worker_threads
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+MANIFEST_NAME = "manifest.jsonl"
+
+# worker process'in modeli; _init_worker'da bir kere kurulur
+_model = None
+
+
+def _is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def iter_inputs(sources):
+    """
+    (çıktı için göreli isim, byte'ları döndüren fonksiyon) çiftlerini sırayla üretir.
+    Klasörler alt klasörleriyle taranır, zip'ler açılmadan içinden okunur, diğer argümanlar glob kalıbıdır.
+    """
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if _is_image(name):
+                        path = os.path.join(root, name)
+                        yield os.path.relpath(path, source), _file_reader(path)
+        elif zipfile.is_zipfile(source):
+            prefix = os.path.splitext(os.path.basename(source))[0]
+            with zipfile.ZipFile(source) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and _is_image(info.filename):
+                        yield os.path.join(prefix, info.filename), _zip_reader(archive, info)
+        else:
+            matches = sorted(glob.iglob(source, recursive=True))
+            if not matches:
+                print(f"warning: {source} matched no files", file=sys.stderr)
+            root = _glob_root(source)
+            for path in matches:
+                if os.path.isfile(path) and _is_image(path):
+                    # "catalog/**/*.jpg" ile a/1.jpg ve b/1.jpg aynı çıktıya yazılmasın: alt klasörler korunur
+                    yield os.path.relpath(path, root), _file_reader(path)
+
+
+# kalıbın joker karakter içermeyen baş kısmı ("catalog/**/*.jpg" -> "catalog"); tek dosya yolu için klasörü
+def _glob_root(pattern):
+    if not glob.has_magic(pattern):
+        return os.path.dirname(pattern) or "."
+    parts = []
+    for part in pattern.split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or ("/" if pattern.startswith(os.sep) else ".")
+
+
+def _file_reader(path):
+    def read():
+        with open(path, "rb") as f:
+            return f.read()
+    return read
+
+
+def _zip_reader(archive, info):
+    return lambda: archive.read(info)
+
+
+def output_path(output_dir, name, extension):
+    # zip içindeki "../" gibi isimler çıktı klasörünün dışına yazamasın
+    relative = os.path.normpath(name).lstrip(os.sep)
+    while relative.startswith(".." + os.sep):
+        relative = relative[3:]
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + "." + extension)
+
+
+def read_manifest(path):
+    """Manifest'teki tamamlanmış resimler: sha256 -> yazıldığı çıktı yolları; yarım yazılmış son satır yok sayılır"""
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    done.setdefault(entry["sha256"], set()).add(entry["output"])
+                except (ValueError, KeyError):
+                    continue
+    return done
+
+
+def _init_worker(torch_threads):
+    global _model
+    import torch
+    from ai.main import create_model
+
+    # worker'lar aynı çekirdekleri paylaşır; her biri tüm çekirdekleri kullanmaya çalışırsa birbirini yavaşlatır
+    torch.set_num_threads(torch_threads)
+    torch.set_num_interop_threads(1)
+    _model = create_model()
+
+
+def _process(data, destination, output_format):
+    from ai.encoding import encode_image
+    from ai.main import remove_background
+
+    start = time.perf_counter()
+    # her resim bir kere işlendiği için maske önbelleği sadece bellek harcar
+    result = remove_background(_model, io.BytesIO(data), cache=None)
+    encoded = encode_image(result, output_format)
+
+    # önce geçici dosyaya yazıp sonra taşıyoruz: yarıda kesilen bir çalıştırma bozuk çıktı bırakmasın
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    temporary = destination + ".part"
+    with open(temporary, "wb") as f:
+        f.write(encoded.data)
+    os.replace(temporary, destination)
+    return time.perf_counter() - start
+
+
+# aynı içeriğin bitmiş çıktısını yeni yola kopyalar; _process gibi önce geçici dosyaya
+def _copy_output(source, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    temporary = destination + ".part"
+    shutil.copyfile(source, temporary)
+    os.replace(temporary, destination)
+
+
+class Progress:
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last = 0.0
+        self.done = self.copied = self.skipped = self.failed = 0
+
+    def report(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last < self.interval:
+            return
+        self.last = now
+        elapsed = now - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        print(f"done {self.done}  copied {self.copied}  skipped {self.skipped}  failed {self.failed}  {rate:.2f} img/s  {elapsed:.0f}s", flush=True)
+
+
+def run(sources, output_dir, workers, torch_threads, output_format, max_in_flight):
+    from ai.encoding import normalize_format
+    output_format = normalize_format(output_format)
+    extension = "webp" if output_format == "webp" else "png"
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    done = read_manifest(manifest_path)
+    progress = Progress()
+
+    # spawn: ana process'te torch/OpenMP thread'leri başlamış olabilir, fork'lanmış kopyaları kilitlenebilir
+    context = multiprocessing.get_context("spawn")
+    with open(manifest_path, "a") as manifest, \
+            ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(torch_threads,)) as pool:
+        pending = {}
+
+        def record(digest, name, destination, **extra):
+            manifest.write(json.dumps({"sha256": digest, "source": name, "output": destination, **extra}) + "\n")
+            manifest.flush()
+            done.setdefault(digest, set()).add(destination)
+
+        def collect(futures):
+            for future in futures:
+                name, digest, destination = pending.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    progress.failed += 1
+                    print(f"failed: {name}: {e}", file=sys.stderr)
+                    continue
+                # manifest'e sadece başarılı sonuçlar girer; başarısız bir içerik sonraki kopyalarında tekrar denenir
+                record(digest, name, destination, seconds=round(seconds, 3))
+                progress.done += 1
+
+        for name, read in iter_inputs(sources):
+            data = read()
+            digest = hashlib.sha256(data).hexdigest()
+            destination = output_path(output_dir, name, extension)
+            outputs = done.get(digest, ())
+            # bu girdinin çıktısı (önceki bir çalıştırmada) zaten yazılmış
+            if destination in outputs and os.path.exists(destination):
+                progress.skipped += 1
+                continue
+            # aynı içerik başka bir isimle işlenmiş: model tekrar çalışmaz, çıktı kopyalanır
+            existing = next((path for path in outputs if os.path.exists(path)), None)
+            if existing is not None:
+                _copy_output(existing, destination)
+                record(digest, name, destination, copied_from=existing)
+                progress.copied += 1
+                continue
+
+            # aynı içerik hâlâ havuzdaysa tekrar işlenir; bekleme penceresi max_in_flight kadar olduğu için seyrek
+            pending[pool.submit(_process, data, destination, output_format)] = (name, digest, destination)
+            del data
+
+            # havuzda en fazla max_in_flight resim bekler; fazlası okunmadan önce biri bitsin
+            if len(pending) >= max_in_flight:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            progress.report()
+
+        collect(wait(pending)[0])
+    progress.report(force=True)
+    return progress
+
+
+def main():
+    cpu_count = available_cpus()
+    parser = argparse.ArgumentParser(description="Remove backgrounds from directories, globs and zip archives in parallel")
+    parser.add_argument("sources", nargs="+", help="directories, glob patterns (quote them) or .zip files")
+    parser.add_argument("--output", required=True, help="output directory, also holds the resume manifest")
+    parser.add_argument("--workers", type=int, default=max(1, cpu_count // 2), help="worker processes, each loads its own model")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads per worker (default: cpu count / workers)")
+    parser.add_argument("--format", default=None, help="png, webp or mask (default: OUTPUT_FORMAT)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="images read ahead and queued in the pool, bounds memory (default: 2 x workers)")
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    threads = args.threads or worker_threads(workers)
+    progress = run(args.sources, args.output, workers, threads, args.format, args.max_in_flight or 2 * workers)
+    if progress.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""İçerik adresli (content-addressed) maske önbelleği: hafızada LRU + isteğe bağlı disk katmanı"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+
+MASK_CACHE_MEMORY_MB = float(os.getenv("MASK_CACHE_MEMORY_MB", "64")) # hafızadaki maskelerin toplam boyut sınırı, 0 ise kapalı
+MASK_CACHE_DIR = os.getenv("MASK_CACHE_DIR")                             # verilirse maskeler bu klasörde de saklanır
+MASK_CACHE_DISK_MB = float(os.getenv("MASK_CACHE_DISK_MB", "1024"))    # disk katmanının boyut sınırı
+
+
+# Anahtar: çözülmüş (decode edilmiş) RGB piksellerin hash'i + boyut + model/konfigürasyon versiyonu.
+# Aynı fotoğraf farklı bir dosya adıyla ya da farklı metadata ile yüklense de aynı anahtarı verir
+def cache_key(image, version):
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{version}|{image.size[0]}x{image.size[1]}|".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class MaskCache:
+    """
+    Maskeleri (RGBA sonucu değil, sadece tek kanallı 0/255 maskeyi) saklar.
+    Hafıza katmanı toplam byte'a göre sınırlı bir LRU'dur; disk katmanı maskeleri PNG olarak yazar
+    ve sınır aşılınca en eski kullanılan dosyaları siler.
+    """
+
+    def __init__(self, memory_bytes, disk_dir=None, disk_bytes=0):
+        self.memory_bytes = int(memory_bytes)
+        self.disk_dir = disk_dir
+        self.disk_bytes = int(disk_bytes)
+
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_used = sum(size for _, _, size in self._disk_entries())
+
+    @classmethod
+    def from_env(cls):
+        return cls(MASK_CACHE_MEMORY_MB * 1024 * 1024, MASK_CACHE_DIR, MASK_CACHE_DISK_MB * 1024 * 1024)
+
+    @property
+    def enabled(self):
+        return self.memory_bytes > 0 or bool(self.disk_dir)
+
+    def get(self, key):
+        with self._lock:
+            mask = self._memory.get(key)
+            if mask is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return mask
+
+        mask = self._disk_get(key)
+        with self._lock:
+            if mask is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._memory_put(key, mask)
+        return mask
+
+    def put(self, key, mask):
+        with self._lock:
+            self._memory_put(key, mask)
+        self._disk_put(key, mask)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_bytes": self._disk_used,
+            }
+
+    def _memory_put(self, key, mask):
+        if mask.nbytes > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= old.nbytes
+        self._memory[key] = mask
+        self._memory_used += mask.nbytes
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= evicted.nbytes
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.png")
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        mask = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if mask is None:
+            return None
+        try:
+            os.utime(path) # en son kullanılma zamanı olarak mtime'ı güncelliyoruz, silme sırası buna göre
+        except FileNotFoundError:
+            pass
+        return mask
+
+    def _disk_put(self, key, mask):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        ok, encoded = cv2.imencode(".png", mask) # 0/255 maskeler PNG ile çok iyi sıkışır
+        if not ok:
+            return
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp_path, path) # yarım yazılmış dosya hiçbir zaman okunmasın
+
+        with self._lock:
+            self._disk_used += len(encoded)
+            over_limit = self._disk_used > self.disk_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+        used = sum(size for _, _, size in entries)
+        target = self.disk_bytes * 0.9 # her seferinde silmemek için sınırın biraz altına iniyoruz
+        for path, _, size in entries:
+            if used <= target:
+                break
+            try:
+                os.remove(path)
+                used -= size
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._disk_used = used
+
+
+mask_cache = MaskCache.from_env()
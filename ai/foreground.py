@@ -0,0 +1,33 @@
+"""
+Düşük bellekli ön plan başlığı. DeepLabV3 normalde 21 sınıfın logit'lerini giriş boyutuna büyütür
+(1024x1024'te ~88 MB float32) ve biz bunun sadece "arka plan mı değil mi" kısmını kullanıyoruz.
+ForegroundSegmentation logit'leri decoder'ın kendi adımında (stride 16) tek bir ön plan skoruna indirir;
+giriş boyutuna sadece bu tek kanal büyütülür (predict_masks içinde).
+"""
+
+import os
+
+import torch
+
+FOREGROUND_HEAD = os.getenv("FOREGROUND_HEAD", "0") == "1"
+
+
+class ForegroundSegmentation(torch.nn.Module):
+    """
+    {"fg": (B, 1, H/16, W/16)} döndürür: en güçlü nesne sınıfının logit'i eksi arka plan (0) logit'i.
+    Skor > 0, argmax != 0 ile aynı karardır.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.backbone = model.backbone
+        self.classifier = model.classifier
+
+    def forward(self, x):
+        logits = self.classifier(self.backbone(x)["out"])
+        return {"fg": logits[:, 1:].amax(1, keepdim=True) - logits[:, :1]}
+
+
+# modelin predict_masks'e döndürdüğü çıktının anahtarı: "fg" (tek kanal, düşük çözünürlük) ya da "out" (21 sınıf)
+def output_key(model):
+    return "fg" if isinstance(model, ForegroundSegmentation) else "out"
@@ -1,108 +1,301 @@
 import torch                        # PyTorch Deep Learning kütüphanesidir
+import torch.nn.functional as F
 import cv2                          # OpenCV Görüntü işleme kütühanesidir
 import numpy as np                  # Sayısal Python (Numerical Python): Sayısal işlemler yaparken kullanılır
-from PIL import Image               # Pillow (Python Imaging Library): Görüntüleri açma, döndürme, kırpma ve boyutlandırma
-from torchvision import transforms  # TorchVision kütüpünün transforms modülü: Data Augmentation, ToTensor, Normalizasyon
+from PIL import Image, ImageOps     # Pillow (Python Imaging Library): Görüntüleri açma, döndürme, kırpma ve boyutlandırma
 import os
 import streamlit as st 
+from ai.preprocess import Preprocessor, get_preprocessor # ToTensor + Normalize adımlarını birleştiren ön işleme hattı
+from ai.timing import stage
+from ai.metrics import REGISTRY # /metrics'te yayınlanan histogram ve sayaçlar
+from ai.cache import cache_key, mask_cache # aynı resim için modeli tekrar çalıştırmamak adına maske önbelleği
+from ai.runtimes import build_engine, INFERENCE_BACKEND # eager / TorchScript / ONNX Runtime / int8
+from ai.model_store import load_local_model, MODEL_REVISION
+from ai.foreground import ForegroundSegmentation, FOREGROUND_HEAD # 21 sınıf yerine tek kanallı, düşük çözünürlüklü ön plan skoru
+from ai.resolution import guided_upsample, inference_size, INFERENCE_SHORT_SIDE # modelin çalıştığı çözünürlük
+from ai.workers import configure_threads # aynı makinedeki worker'lar çekirdekleri paylaşır
 
 
-# modeli kur
+# eager (fp32) modeli yerel model klasöründen kur. torch.hub'a (ağa) gidilmez, bu yüzden açılış hızlı ve internetsiz çalışır
+def load_eager_model():
+    return load_local_model() # eval modunda, çıkarımda gereksiz olan aux başlığı olmadan gelir
+
+# modeli kur ve INFERENCE_BACKEND ile seçilen runtime'a (eager, TorchScript, ONNX, int8) çevir
 @st.cache_resource
 def load_model():
-    auth_header = os.environ.get("Authorization")
-    if auth_header:
-        del os.environ["Authorization"]
-    
-    model = torch.hub.load("pytorch/vision:main", "deeplabv3_mobilenet_v3_large", pretrained=True, trust_repo=True) # pytorch/vision reposundan Hem encoder hem decoder işlemleri yapan DeepLabV3 için olan Resnet101 modelini kur
+    configure_threads() # torch thread sayısı = available_cpus() // (WORKER_PROCESSES x INFERENCE_MAX_IN_FLIGHT)
+    return create_model()
+
+# load_model'in Streamlit önbelleği olmadan hali; ayrı process'lerde (ai.bulk worker'ları) her biri kendi modelini kurar
+def create_model():
+    model = load_eager_model()
+    if FOREGROUND_HEAD:
+        model = ForegroundSegmentation(model)
+
+    # eğer GPU kullanılabilirse ise modeli orada, değilse CPU'da çalıştır. Bunu her istekte değil, bir kere burada yapıyoruz
+    # (ONNX backend'leri her zaman CPU'da çalışır)
+    device = "cuda" if torch.cuda.is_available() and not INFERENCE_BACKEND.startswith("onnx") else "cpu" 
+    model.to(device)
+
+    # ön işleme hattını da bir kere kurup modele iliştiriyoruz
+    model.preprocessor = Preprocessor(device)
+
+    return build_engine(model, INFERENCE_BACKEND, device)
+
+# batch içinde resimleri gruplarken kullanılan kova (bucket) adımı. Aynı kovaya düşen resimler
+# en büyüklerinin boyutuna pad'lenip tek bir forward pass'te modelden geçirilir
+BUCKET_STEP = 128
+MAX_IMAGE_SIZE = (1024, 1024)
+MAX_INPUT_PIXELS = int(os.getenv("MAX_INPUT_PIXELS", str(64 * 1000 * 1000))) # bundan büyük resimler hiç decode edilmez
+
+
+# Pillow'un kendi bomba koruması aynı sınırla çalışsın; 2 x MAX_IMAGE_PIXELS üstünü Image.open içinde reddediyor
+Image.MAX_IMAGE_PIXELS = MAX_INPUT_PIXELS
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+def open_image(source):
+    """
+    Resmi tembel (lazy) açar, sadece başlık okunur. Piksel sayısı MAX_INPUT_PIXELS'ı aşıyorsa ImageTooLargeError;
+    Pillow'un DecompressionBombError'ı da (çok büyük resimler daha Image.open'da reddedilir) aynı hataya çevrilir.
+    """
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+    if image.width * image.height > MAX_INPUT_PIXELS:
+        image.close()
+        raise ImageTooLargeError(f"Image has {image.width}x{image.height} pixels, the limit is {MAX_INPUT_PIXELS}")
+    return image
+
+# önbellek anahtarına giren model/konfigürasyon versiyonu. Maskeyi değiştirecek bir ayar değişirse bu da değişmeli
+MODEL_VERSION = f"deeplabv3_mobilenet_v3_large@{MODEL_REVISION}|max={MAX_IMAGE_SIZE[0]}x{MAX_IMAGE_SIZE[1]}|backend={INFERENCE_BACKEND}|head={'fg' if FOREGROUND_HEAD else 'out'}"
 
-    if auth_header:
-        os.environ["Authorization"] = auth_header
-    
-    model.eval() # modeli değerlendirme modu olan evaluation moduna al
+# çıkarım çözünürlüğü de maskeyi değiştirdiği için anahtara giriyor
+def mask_version(short_side=INFERENCE_SHORT_SIDE):
+    return f"{MODEL_VERSION}|short={short_side or 'full'}"
 
-    return model
+# ısınma (warmup) için kullanılan yaygın giriş boyutları (genişlik x yükseklik), load_image sonrası en çok görülenler
+WARMUP_SIZES = os.getenv("WARMUP_SIZES", "1024x768,768x1024,1024x1024,512x512")
+
+# modeli sahte resimlerle her yaygın boyutta bir kere çalıştırır. İlk forward pass'ler (bellek ayırma, kernel seçimi,
+# ONNX/TorchScript graf optimizasyonu) yavaştır; bunu ilk gerçek isteğe değil açılışa yüklüyoruz
+def warmup(model, sizes=WARMUP_SIZES, timings=None):
+    for size in filter(None, (size.strip() for size in sizes.split(","))):
+        width, height = (int(value) for value in size.lower().split("x"))
+        with stage(timings, f"warmup_{width}x{height}"):
+            predict_masks(model, [Image.new("RGB", (width, height))], cache=None)
+
+# resmin MAX_IMAGE_SIZE kutusuna sığdırılmış boyutu (en-boy oranı korunur, büyütülmez)
+def _fitted_size(size):
+    scale = min(MAX_IMAGE_SIZE[0] / size[0], MAX_IMAGE_SIZE[1] / size[1], 1.0)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+# Görüntüyü açar, RGB'ye çevirir ve gerekirse küçültür
+def load_image(input_source, timings=None):
+    """
+    Dosya yolu, dosya benzeri nesne (Streamlit UploadedFile, BytesIO) ya da PIL Image alır;
+    modele girecek olan RGB ve en fazla 1024x1024 boyutlu resmi döndürür.
+    Büyük resimler tam çözünürlükte hiç açılmaz: JPEG'ler DCT aşamasında 1/2, 1/4 ya da 1/8 ölçekte çözülür (draft),
+    diğer formatlar önce tam sayı katına (reduce) sonra LANCZOS ile küçültülür. EXIF yönü (telefon fotoğrafları) uygulanır.
+    """
+    with stage(timings, "decode"):
+        if isinstance(input_source, Image.Image):
+            input_image = input_source.convert("RGB")
+        else:
+            # Streamlitten gelen img dosyası gelirse bazen okuma imleci sonda olabilir, başa alıyoruz.
+            if hasattr(input_source, 'seek'):
+                input_source.seek(0)
+
+            # sadece başlık okunur; piksel sayısı sınırı decode'dan önce kontrol edilir
+            input_image = open_image(input_source)
+
+            # 48 MP'lik bir JPEG 1/4 ölçekte çözülür: yüzlerce MB yerine birkaç MB (diğer formatlarda etkisiz)
+            input_image.draft("RGB", _fitted_size(input_image.size))
+            if input_image.mode in ("P", "1"):
+                input_image = input_image.convert("RGB") # paletli resimler küçültmeden önce (yoksa en yakın komşu ile küçülür)
+
+    # --- RESMİ KÜÇÜLTME ---
+    with stage(timings, "resize"):
+        if input_image.size[0] > MAX_IMAGE_SIZE[0] or input_image.size[1] > MAX_IMAGE_SIZE[1]:
+            # reducing_gap: önce ucuz tam sayı katı küçültme (reduce), kalan kısmı LANCZOS
+            input_image.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        # yön, küçültülmüş resme uygulanır (ucuz); kutu kare olduğu için döndürme 1024 sınırını bozmaz
+        input_image = ImageOps.exif_transpose(input_image)
+        if input_image.mode != "RGB":
+            input_image = input_image.convert("RGB")
+
+    return input_image
 
 # Remove Background : Data Preprocessing | Model Prediction | Masking 
-def remove_background(model, input_source):
+def remove_background(model, input_source, timings=None, cache=mask_cache):
     """
     Ana işlem akışını yönetir: Resmi açar, ön işler, modelden geçirir,
     maskeyi oluşturur ve son şeffaf resmi üretir.
+    timings bir dict verilirse her aşamanın süresi (saniye) içine yazılır.
     """
+    return remove_background_batch(model, [input_source], timings, cache)[0]
 
-    # Streamlitten gelen img dosyası gelirse bazen okuma imleci sonda olabilir, başa alıyoruz.
-    if hasattr(input_source, 'seek'):
-        input_source.seek(0)
+# Birden fazla resmin arkaplanını tek seferde kaldırır
+def remove_background_batch(model, sources, timings=None, cache=mask_cache):
+    """
+    Resimleri boyut kovalarına (bucket) göre gruplar, her grubu tek bir forward pass ile
+    modelden geçirir ve her kaynak için sırasıyla RGBA sonucunu döndürür.
+    """
+    # aşama süreleri her zaman ölçülüp metriklere yazılır; çağıran timings verdiyse ona da eklenir
+    batch_timings = {}
+    input_images = [load_image(source, batch_timings) for source in sources]
 
-    # görüntüyü açar ve görüntüyü 3 kanallı RGB formatına getirir
-    input_image = Image.open(input_source).convert("RGB")
+    masks = predict_masks(model, input_images, batch_timings, cache)
 
-    # --- RESMİ KÜÇÜLTME ---
-    max_size = (1024, 1024)
-    if input_image.size[0] > max_size[0] or input_image.size[1] > max_size[1]:
-        input_image.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-    # Image Preprocessing (Resim Önişleme)
-    preprocess = transforms.Compose([
-        transforms.ToTensor(), # resmi Tensor formatına çevirir ve min max normalization yapar (x/255)
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]) # İstatistiksel normalizasyon.
-    ])
-
-    # preprocess işlemlerini resme uygula
-    input_tensor = preprocess(input_image) 
-
-    # PyTorch'a kaç adet resim vereceğimizi kanala gömerek söylüyoruz. Görsel bir tensör genelde şu boyutlardadır: (C, H, W).
-    # C → Kanal sayısı (örneğin RGB için 3), H → Yükseklik (Height), W → Genişlik (Width).
-    # Ama PyTorch modelleri tek bir resmi bile batch (grup) olarak ister. -> (B, C, H, W)
-    # B = batch size (örneğin 32 resimlik grup). Eğer sadece 1 resim varsa bile B = 1 olmalı.
-    input_batch = input_tensor.unsqueeze(0)
-
-    # eğer GPU kullanılabilirse ise modeli orada, değilse CPU'da çalıştır
-    device = "cuda" if torch.cuda.is_available() else "cpu" 
-    model.to(device)
-    input_batch = input_batch.to(device) # modele verilecek resmi, modelin bulunduğu yerle aynı yere taşı
+    # Şeffaf ön planı oluştur
+    with stage(batch_timings, "composite"):
+        results = [make_transparent_foreground(image, mask) for image, mask in zip(input_images, masks)]
 
-    # Model Prediction / Model Inference (hesaplama verimliliğini Gradianları kapatma tekniği ile)
-    with torch.no_grad(): # Gradyanları Kapatarak işlemleri yap
-        """
-        Derin öğrenme modelleri, eğitim sırasında ağırlıklarını güncellemek için gerekli olan gradyanları (türevleri)(Gradient Descent) 
-        hesaplamak zorundadır. Bu hesaplama, büyük miktarda bellek (RAM/VRAM) ve işlem gücü (CPU/GPU) tüketir.
+    _record_inference(input_images, batch_timings)
+    if timings is not None:
+        for name, seconds in batch_timings.items():
+            timings[name] = timings.get(name, 0.0) + seconds
+    return results
 
-        torch.no_grad() bağlam yöneticisi, PyTorch'a bu blok içindeki tüm tensör işlemleri için gradyan hesaplamasını durdurmasını söyler.
+INFERENCE_STAGE_SECONDS = REGISTRY.histogram("inference_stage_seconds", "Background removal time per batch and stage",
+                                             labels=("stage", "size"))
+INFERENCE_IMAGES = REGISTRY.counter("inference_images_total", "Images passed through background removal", labels=("size",))
 
-        Amaç: Model eğitimi bittiğinde ve siz sadece modelin tahminini (çıkarımını) kullanmak istediğinizde, 
-        gradyanlara ihtiyacınız yoktur. Bu bloğu kullanarak:
+# metrik etiketi: batch'teki en büyük resmin uzun kenarı 256'nın katına yuvarlanır (256, 512, 768, 1024)
+def _size_label(images):
+    longest = max(max(image.size) for image in images)
+    return str(-(-longest // 256) * 256)
 
-        - Bellek tüketimini azaltırsınız.
-        - İşlem hızını artırırsınız. (Gradyan hesaplaması için harcanan zamanı ortadan kaldırırsınız.)
+def _record_inference(images, batch_timings):
+    if not images:
+        return
+    size = _size_label(images)
+    INFERENCE_IMAGES.inc(len(images), size=size)
+    for name, seconds in batch_timings.items():
+        INFERENCE_STAGE_SECONDS.observe(seconds, stage=name, size=size)
 
-        Yani model training'de görevli Gradient Descentlerin Model Prediction'da açık kalmasının bir mantığı yok. Kapat!
-        """
+# Sadece önbelleğe bakar: maske önbellekteyse modeli hiç çalıştırmadan RGBA sonucu döndürür, yoksa None
+def remove_background_cached(input_source, cache=mask_cache):
+    if cache is None or not cache.enabled:
+        return None
 
-        output = model(input_batch)["out"][0] # model tahmini yapılıyor
-    
-    # yukarıdaki "output" değişkeni, tüm pikseller için hangi sınıfa ait olabileceğine dair olasılıkları tutan bir dizi gibi
-    # buradaki işlemle, her bir pikselin içerisindeki en yüksek olasılığı alıyoruz. 
-    # yani bu piksel %10 kedi, %3 araba, %87 koltuk ise, bunun belirtildiği listede argmax ile max olanı alıyoruz
-    # bize tüm olasılıklar değil, en yüksek olanı lazım  
-    output_predictions = output.argmax(0)
+    input_image = load_image(input_source)
+    mask = cache.get(cache_key(input_image, mask_version()))
+    if mask is None:
+        return None
+    return make_transparent_foreground(input_image, mask)
 
-    # Tahminleri CPU'ya taşıyıp NumPy dizisine çevir
-    mask = output_predictions.byte().cpu().numpy()
+# resmin düşeceği kovayı bulur: (yükseklik, genişlik) BUCKET_STEP'in katına yuvarlanır
+def _bucket_key(image):
+    width, height = image.size
+    return (-(-height // BUCKET_STEP) * BUCKET_STEP, -(-width // BUCKET_STEP) * BUCKET_STEP)
 
-    # Arka plan genellikle COCO ve Pascal VOC veri setlerinde 0 ID'sine sahiptir.
-    # 0 dışındaki tüm sınıflar bir nesne anlamına gelir (insan, araba, kedi, sandalye, vs.)
-    # Bu yüzden mask != 0 olan pikselleri ön plan olarak alıyoruz.
-    # Etiketi 0 olan yeri 0, yani siyah yap. Etiketi sıfırdan farklı olan yerleri(arkaplan olmayan heryeri) 255, yani beyaz yap
-    foreground_mask = np.where(mask != 0, 255, 0).astype(np.uint8) # mask idsi sıfır olmayan herşeyi al. sıfır olanlar kalsın
+# Resimleri modelden geçirip her biri için kendi boyutunda 0/255 ön plan maskesi döndürür
+def predict_masks(model, input_images, timings=None, cache=mask_cache, short_side=INFERENCE_SHORT_SIDE):
+    """
+    short_side verilirse model kısa kenarı short_side olacak şekilde küçültülmüş resimlerde çalışır ve maske
+    guided_upsample ile resmin kenarlarına bakılarak çalışma çözünürlüğüne büyütülür.
+    """
+    # Image Preprocessing (Resim Önişleme) hattı load_model'de bir kere kuruldu
+    preprocess = get_preprocessor(model)
+    version = mask_version(short_side)
 
-    # Orijinal resmin boyutlarına uyacak şekilde maskeyi yeniden boyutlandır
-    resized_mask = cv2.resize(foreground_mask, input_image.size)
-    
-    # Şeffaf ön planı oluştur
-    foreground = make_transparent_foreground(input_image, resized_mask)
+    masks = [None] * len(input_images)
+    keys = [None] * len(input_images)
+
+    # önbellekte maskesi olan resimler modele hiç girmiyor
+    if cache is not None and cache.enabled:
+        with stage(timings, "cache"):
+            for index, image in enumerate(input_images):
+                keys[index] = cache_key(image, version)
+                masks[index] = cache.get(keys[index])
+
+    # modele girecek (gerekirse küçültülmüş) resimler ve aynı kovaya düşenlerin indexleri
+    model_images = {}
+    buckets = {}
+    with stage(timings, "resize"):
+        for index, image in enumerate(input_images):
+            if masks[index] is not None:
+                continue
+            size = inference_size(image.size, short_side)
+            model_images[index] = image if size == image.size else image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+            buckets.setdefault(_bucket_key(model_images[index]), []).append(index)
+
+    for indices in buckets.values():
+        images = [model_images[i] for i in indices]
+
+        # Grubun en büyük resminin boyutuna sağdan ve alttan pad'liyoruz ki hepsi aynı (C, H, W) boyutunda olsun.
+        # Tek resim varsa pad'e gerek kalmıyor.
+        height = max(image.size[1] for image in images)
+        width = max(image.size[0] for image in images)
+
+        # PyTorch modelleri resimleri batch (grup) olarak ister -> (B, C, H, W). Batch, modelin bulunduğu cihazda oluşur
+        with stage(timings, "preprocess"):
+            input_batch = preprocess(images, height, width)
+
+        # Model Prediction / Model Inference (hesaplama verimliliğini Gradianları kapatma tekniği ile)
+        with stage(timings, "forward"), torch.no_grad(): # Gradyanları Kapatarak işlemleri yap
+            """
+            Derin öğrenme modelleri, eğitim sırasında ağırlıklarını güncellemek için gerekli olan gradyanları (türevleri)(Gradient Descent) 
+            hesaplamak zorundadır. Bu hesaplama, büyük miktarda bellek (RAM/VRAM) ve işlem gücü (CPU/GPU) tüketir.
+
+            torch.no_grad() bağlam yöneticisi, PyTorch'a bu blok içindeki tüm tensör işlemleri için gradyan hesaplamasını durdurmasını söyler.
+
+            Yani model training'de görevli Gradient Descentlerin Model Prediction'da açık kalmasının bir mantığı yok. Kapat!
+            """
+
+            output = model(input_batch) # model tahmini yapılıyor -> {"out": (B, 21, H, W)} ya da {"fg": (B, 1, H/16, W/16)}
+
+        with stage(timings, "postprocess"):
+            # çalışma çözünürlüğünde (küçültülmeden) modelden geçen resimler
+            full_size = [i for i in indices if model_images[i].size == input_images[i].size]
+
+            if "fg" in output:
+                # ön plan başlığı: skor decoder'ın adımında (stride 16) tek kanal olarak geliyor,
+                # giriş boyutuna sadece bu kanal büyütülüyor (21 kanal yerine)
+                margin = F.interpolate(output["fg"], size=(height, width), mode="bilinear", align_corners=False)[:, 0]
+            else:
+                logits = output["out"]
+                margin = None
+
+            if full_size:
+                # "output" değişkeni, tüm pikseller için hangi sınıfa ait olabileceğine dair olasılıkları tutuyor.
+                # yani bu piksel %10 kedi, %3 araba, %87 koltuk ise, argmax ile max olanı alıyoruz.
+                # Arka plan Pascal VOC'ta 0 ID'sine sahiptir. 0 dışındaki tüm sınıflar bir nesne anlamına gelir.
+                # Etiketi 0 olan yeri 0, yani siyah yap. Etiketi sıfırdan farklı olan yerleri 255, yani beyaz yap
+                foreground = margin > 0 if margin is not None else logits.argmax(1) != 0
+                # Tahminleri CPU'ya taşıyıp NumPy dizisine çevir
+                predictions = foreground.byte().mul_(255).cpu().numpy()
 
-    return Image.fromarray(foreground)
+            if len(full_size) < len(indices):
+                # küçültülerek çalışılan resimler için ön plan skoru: en güçlü nesne sınıfı ile arka plan (0) arasındaki
+                # farkın sigmoid'i. 0.5 eşiği argmax != 0 ile aynı kararı verir ama büyütme için yumuşak bir geçiş sağlar
+                if margin is None:
+                    margin = logits[:, 1:].amax(1) - logits[:, 0]
+                scores = torch.sigmoid(margin).cpu().numpy()
+
+            for batch_index, image_index in enumerate(indices):
+                image = input_images[image_index]
+                model_width, model_height = model_images[image_index].size
+
+                if (model_width, model_height) == image.size:
+                    # pad'lenen kısmı kesip atıyoruz
+                    masks[image_index] = np.ascontiguousarray(predictions[batch_index, :model_height, :model_width])
+                else:
+                    # maskeyi çalışma çözünürlüğüne, resmin kenarlarını takip ederek büyütüyoruz
+                    score = np.ascontiguousarray(scores[batch_index, :model_height, :model_width])
+                    refined = guided_upsample(score, np.asarray(image))
+                    masks[image_index] = cv2.compare(refined, 0.5, cv2.CMP_GT) # 255 / 0
+
+                if keys[image_index] is not None:
+                    cache.put(keys[image_index], masks[image_index])
+
+    return masks
 
 # Fotoğraftaki Arka planı şeffaf yapar, ön planı görünür bırakır.
 def make_transparent_foreground(pic, mask): # parametreler;   pic: input resmi       mask: maskeleme
@@ -110,23 +303,102 @@ def make_transparent_foreground(pic, mask): # parametreler;   pic: input resmi
     Bir fotoğrafın arkaplanını şeffaf, ön planını görünür yapar.
     Bu işlem, maske adı verilen siyah-beyaz bir görüntü kullanılarak gerçekleştirilir.
     Maske, fotoğrafın ön planını beyaz yaparak görünür kılarken, arkaplanını planını siyah yaparak şeffaf hale getirir
+    pic yerinde (in-place) RGBA'ya çevrilip döndürülür; çağıran onu load_image ile kendisi oluşturmuş olmalı.
     """
 
-    # resmi numpy arrayine çevir
-    img_np = np.array(pic)
+    # RGB = 3 kanal → (Kırmızı, Yeşil, Mavi)   RGBA = 4 kanal → (Kırmızı, Yeşil, Mavi, Alfa). Alfa kanalı saydamlık bilgisidir.
+    # Maske zaten 0/255: 255 olan yerler (modelin önemli dediği, ön plan) opak, 0 olan yerler (arka plan) şeffaf olur.
+    # putalpha maskeyi doğrudan alfa kanalına yazar; numpy'a çevirme, cvtColor, alfayı sıfırlayıp
+    # maskeyle indexleme gibi tam boyutlu ara kopyalar yok. 0 = şeffaf, 255 = opak
+    pic.putalpha(Image.fromarray(mask))
+
+    return pic
+
+# --- VİDEO / KARE DİZİSİ ---
+# Ardışık kareler çoğu zaman neredeyse aynıdır; modeli her karede çalıştırmak yerine son anahtar kareden (keyframe)
+# ne kadar değiştiğine bakıyoruz. Değişim 0..1 arası, 64x64 gri küçük kopyalar arasındaki ortalama mutlak fark
+VIDEO_SKIP_THRESHOLD = float(os.getenv("VIDEO_SKIP_THRESHOLD", "0.02"))         # altı: model çalışmaz, önceki maske kaydırılır
+VIDEO_KEYFRAME_THRESHOLD = float(os.getenv("VIDEO_KEYFRAME_THRESHOLD", "0.08")) # altı: model küçük çözünürlükte çalışır, üstü: yeni anahtar kare
+VIDEO_FAST_SHORT_SIDE = int(os.getenv("VIDEO_FAST_SHORT_SIDE", "256"))          # ara karelerde modele girecek kısa kenar
+VIDEO_MAX_KEYFRAME_INTERVAL = int(os.getenv("VIDEO_MAX_KEYFRAME_INTERVAL", "30")) # en fazla bu kadar karede bir tam çözünürlük
+VIDEO_MASK_SMOOTHING = float(os.getenv("VIDEO_MASK_SMOOTHING", "0.3"))          # yeni maskeye karışan önceki (kaydırılmış) maske oranı, titremeyi azaltır
+VIDEO_FLOW_SIZE = 256 # optik akışın hesaplandığı uzun kenar
+
+FRAME_KEY, FRAME_FAST, FRAME_PROPAGATED = "keyframe", "fast", "propagated"
+
+def _frame_signature(image):
+    return np.asarray(image.convert("L").resize((64, 64), Image.Resampling.BILINEAR), dtype=np.float32) * (1.0 / 255.0)
+
+def _flow_gray(image):
+    scale = VIDEO_FLOW_SIZE / max(image.size)
+    size = (max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale))) if scale < 1 else image.size
+    return np.asarray(image.convert("L").resize(size, Image.Resampling.BILINEAR))
+
+# önceki karenin maskesini optik akışla (Farneback, düşük çözünürlükte) bu kareye kaydırır
+def _propagate_mask(mask, previous_gray, current_gray):
+    flow = cv2.calcOpticalFlowFarneback(current_gray, previous_gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+    height, width = mask.shape
+    scale_x, scale_y = width / current_gray.shape[1], height / current_gray.shape[0]
+    flow = cv2.resize(flow, (width, height), interpolation=cv2.INTER_LINEAR)
+    grid_x, grid_y = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+    map_x = grid_x + flow[..., 0] * scale_x
+    map_y = grid_y + flow[..., 1] * scale_y
+    return cv2.remap(mask, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def remove_background_stream(model, frames, timings=None, stats=None,
+                             skip_threshold=VIDEO_SKIP_THRESHOLD, keyframe_threshold=VIDEO_KEYFRAME_THRESHOLD,
+                             fast_short_side=VIDEO_FAST_SHORT_SIDE, max_interval=VIDEO_MAX_KEYFRAME_INTERVAL,
+                             smoothing=VIDEO_MASK_SMOOTHING):
+    """
+    Kareleri (PIL Image, dosya yolu ya da dosya benzeri nesne) sırayla alıp her biri için RGBA sonucu üreten generator.
+    Sadece bir önceki kare ve maskesi tutulur, yani uzun kliplerde de bellek sabittir.
+    Kare son anahtar kareye göre az değiştiyse model çalışmaz, önceki maske optik akışla kaydırılır; orta düzeyde
+    değiştiyse model fast_short_side çözünürlükte çalışır; çok değiştiyse (ya da max_interval dolduysa) tam çözünürlükte.
+    stats bir dict verilirse her türden kaç kare üretildiği içine yazılır.
+    """
+    key_signature = None
+    previous = None # (maske, optik akış için gri kare)
+    since_key = 0
+
+    for frame in frames:
+        image = load_image(frame, timings)
+        signature = _frame_signature(image)
+        gray = _flow_gray(image)
+
+        change = float(np.abs(signature - key_signature).mean()) if key_signature is not None else None
+        same_size = previous is not None and previous[0].shape == (image.size[1], image.size[0])
+        # sahne kesmesi: önceki maskenin bu karede karşılığı yok, ne kaydırılır ne karıştırılır (eski nesne hayalet gibi kalmasın)
+        scene_cut = change is None or not same_size or change > keyframe_threshold
+        if scene_cut or since_key >= max_interval:
+            kind = FRAME_KEY
+        elif change > skip_threshold:
+            kind = FRAME_FAST
+        else:
+            kind = FRAME_PROPAGATED
 
-    # RGB'yi RGBA'ya çevir. RGB = 3 kanal → (Kırmızı, Yeşil, Mavi)   RGBA = 4 kanal → (Kırmızı, Yeşil, Mavi, Alfa). Alfa kanalı saydamlık bilgisidir
-    rgba_img = cv2.cvtColor(img_np, cv2.COLOR_RGB2RGBA)
+        propagated = None
+        if not scene_cut:
+            with stage(timings, "propagate"):
+                propagated = _propagate_mask(previous[0], previous[1], gray)
 
-    # Alfa kanalını tamamen şeffaf yap. Yani resimdeki her pikselin saydamlık değeri sıfır (tamamen görünmez) hale geliyor. 
-    # Mantık şu: "Her yer, aksi ispat edilene kadar arka plandır (şeffaftır)." Bu, bir sonraki adımda işimizi çok kolaylaştırır. 
-    # Artık sadece ön planın nerede olduğunu bulup orayı opak hale getirmemiz yeterli olacak.
-    rgba_img[:,:,3] = 0
+        if kind == FRAME_PROPAGATED:
+            mask = propagated
+            since_key += 1
+        else:
+            short_side = None if kind == FRAME_KEY else fast_short_side
+            mask = predict_masks(model, [image], timings, cache=None, short_side=short_side)[0]
+            if propagated is not None and smoothing > 0:
+                # yeni maske önceki kareninkiyle karıştırılır: kenarlar kareden kareye zıplamaz (yumuşak alfa)
+                mask = cv2.addWeighted(propagated, smoothing, mask, 1.0 - smoothing, 0)
+            if kind == FRAME_KEY:
+                key_signature = signature
+                since_key = 0
+            else:
+                since_key += 1
 
-    # Maskede beyaz olan yerlere opaklık veriyoruz
-    rgba_img[:,:,3][mask==255]=255
-    # mask == 255 demek, birazdan yazacağımız modelin önemli diye belirttiği yerler demek. 
-    # oraları 255 yap, saydam değil opak yap dedik. yani burada aslında background kaldırılacak. nasıl?
-    # modelin önemli dediği yerlerin opaklığını 0'dan 255'e çıkaracağız. 0 = şeffaf, 255 = opak
+        if stats is not None:
+            stats[kind] = stats.get(kind, 0) + 1
+        previous = (mask, gray)
 
-    return rgba_img
\ No newline at end of file
+        with stage(timings, "composite"):
+            yield make_transparent_foreground(image, mask)
@@ -0,0 +1,136 @@
+"""
+Yerel, versiyonlu model klasörü. Model tanımı kurulu torchvision paketinden, ağırlıklar MODEL_DIR'dan gelir;
+açılışta ağa (torch.hub, GitHub) hiç çıkılmaz.
+
+Klasör yapısı:
+    models/deeplabv3_mobilenet_v3_large/<MODEL_REVISION>/weights.pt
+    models/deeplabv3_mobilenet_v3_large/<MODEL_REVISION>/manifest.json   (sha256, boyut, kaynak)
+
+Ağırlıkları bir kere indirip (Docker imajı build edilirken ya da elle) doğrulamak için:
+    python -m ai.model_store fetch
+    python -m ai.model_store verify
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import torch
+from torchvision.models.segmentation import deeplabv3_mobilenet_v3_large, DeepLabV3_MobileNet_V3_Large_Weights
+
+MODEL_NAME = "deeplabv3_mobilenet_v3_large"
+MODEL_DIR = os.getenv("MODEL_DIR", "./models")
+MODEL_REVISION = os.getenv("MODEL_REVISION", "coco_with_voc_labels_v1") # torchvision ağırlık sürümü, değişirse yeni klasöre iner
+MODEL_AUTO_FETCH = os.getenv("MODEL_AUTO_FETCH", "1") == "1"            # yerel kopya yoksa bir kereye mahsus indirilsin mi
+MODEL_VERIFY_CHECKSUM = os.getenv("MODEL_VERIFY_CHECKSUM", "1") == "1"  # her yüklemede sha256 kontrolü
+MODEL_SHARED_WEIGHTS = os.getenv("MODEL_SHARED_WEIGHTS", "1") == "1"    # parametreler dosyadan mmap'lenir, aynı makinedeki process'ler paylaşır
+
+_WEIGHTS = {"coco_with_voc_labels_v1": DeepLabV3_MobileNet_V3_Large_Weights.COCO_WITH_VOC_LABELS_V1}
+
+
+class ModelStoreError(RuntimeError):
+    pass
+
+
+def revision_dir(revision=MODEL_REVISION):
+    return os.path.join(MODEL_DIR, MODEL_NAME, revision)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(revision=MODEL_REVISION):
+    path = os.path.join(revision_dir(revision), "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def fetch(revision=MODEL_REVISION):
+    """Ağırlıkları torchvision'dan indirir, çıkarımda kullanılmayan aux başlığını atıp manifest'iyle birlikte kaydeder"""
+    if revision not in _WEIGHTS:
+        raise ModelStoreError(f"Unknown MODEL_REVISION {revision!r}, expected one of {sorted(_WEIGHTS)}")
+
+    weights = _WEIGHTS[revision]
+    state_dict = {key: value for key, value in weights.get_state_dict(progress=True).items()
+                  if not key.startswith("aux_classifier.")}
+
+    directory = revision_dir(revision)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "weights.pt")
+    tmp_path = f"{path}.tmp"
+    torch.save(state_dict, tmp_path)
+    os.replace(tmp_path, path) # yarım kalmış bir indirme asla weights.pt olarak görünmesin
+
+    manifest = {
+        "name": MODEL_NAME,
+        "revision": revision,
+        "source": weights.url,
+        "num_classes": len(weights.meta["categories"]),
+        "sha256": _sha256(path),
+        "size": os.path.getsize(path),
+    }
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def verify(revision=MODEL_REVISION):
+    manifest = read_manifest(revision)
+    if manifest is None:
+        raise ModelStoreError(f"No local model at {revision_dir(revision)}, run `python -m ai.model_store fetch` first")
+    path = os.path.join(revision_dir(revision), "weights.pt")
+    if not os.path.exists(path):
+        raise ModelStoreError(f"{path} is missing, run `python -m ai.model_store fetch` again")
+    if _sha256(path) != manifest["sha256"]:
+        raise ModelStoreError(f"{path} does not match the sha256 in its manifest, run `python -m ai.model_store fetch` again")
+    return manifest
+
+
+def load_local_model(revision=MODEL_REVISION, verify_checksum=MODEL_VERIFY_CHECKSUM, shared_weights=MODEL_SHARED_WEIGHTS):
+    """Yerel klasördeki ağırlıklarla eval modunda, aux başlığı olmayan modeli kurar"""
+    manifest = read_manifest(revision)
+    if manifest is None:
+        if not MODEL_AUTO_FETCH:
+            raise ModelStoreError(f"No local model at {revision_dir(revision)} and MODEL_AUTO_FETCH is off")
+        manifest = fetch(revision)
+    elif verify_checksum:
+        manifest = verify(revision)
+
+    # mmap: ağırlıklar dosyadan sayfa sayfa okunur, state_dict için ayrıca bir kopya tutulmaz
+    state_dict = torch.load(os.path.join(revision_dir(revision), "weights.pt"), map_location="cpu", mmap=True, weights_only=True)
+
+    if not shared_weights:
+        model = deeplabv3_mobilenet_v3_large(weights=None, weights_backbone=None, num_classes=manifest["num_classes"], aux_loss=False)
+        model.load_state_dict(state_dict) # her process'in kendi kopyası
+        return model.eval()
+
+    # model "meta" cihazda (bellek ayırmadan, rastgele ilk değerler olmadan) kurulur ve parametreler kopyalanmak yerine
+    # mmap'lenmiş tensörlerin kendisi olur (assign=True). Dosyanın sayfaları işletim sisteminin sayfa önbelleğinde bir kere
+    # durur; aynı makinedeki bütün worker'lar (Streamlit replikaları, uvicorn worker'ları, ai.bulk) aynı sayfaları okur.
+    # Eşleme copy-on-write olduğu için çıkarımda hiç yazılmayan ağırlıklar paylaşılmış olarak kalır
+    with torch.device("meta"):
+        model = deeplabv3_mobilenet_v3_large(weights=None, weights_backbone=None, num_classes=manifest["num_classes"], aux_loss=False)
+    model.load_state_dict(state_dict, assign=True)
+    return model.eval()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local model directory")
+    parser.add_argument("command", choices=("fetch", "verify"))
+    parser.add_argument("--revision", default=MODEL_REVISION)
+    args = parser.parse_args()
+
+    manifest = fetch(args.revision) if args.command == "fetch" else verify(args.revision)
+    print(f"{manifest['name']}/{manifest['revision']}: {manifest['size'] / 1024 / 1024:.1f} MB, sha256 {manifest['sha256']}")
+
+
+if __name__ == "__main__":
+    main()
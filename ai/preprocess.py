@@ -0,0 +1,74 @@
+"""Modelin girişini hazırlayan, load_model anında bir kere kurulan ön işleme (preprocessing) hattı"""
+
+import threading
+import warnings
+
+import numpy as np
+import torch
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# PIL'den gelen numpy dizisi salt okunur; biz ona hiç yazmıyoruz, sadece okuyup kendi buffer'ımıza yazıyoruz
+warnings.filterwarnings("ignore", message="The given NumPy array is not writable", module=__name__)
+
+
+class Preprocessor:
+    """
+    ToTensor (x/255) + Normalize ((x-mean)/std) adımlarını tek bir vektörel işlemde birleştirir:
+        (x/255 - mean) / std  =  x * (1 / (255*std))  +  (-mean/std)
+    uint8 numpy buffer'dan doğrudan, her thread için bir kere ayrılıp tekrar kullanılan giriş tensörüne yazar.
+    """
+
+    def __init__(self, device="cpu"):
+        self.device = torch.device(device)
+
+        mean = torch.tensor(IMAGENET_MEAN, dtype=torch.float32)
+        std = torch.tensor(IMAGENET_STD, dtype=torch.float32)
+        self.scale = (1.0 / (255.0 * std)).view(3, 1, 1)
+        self.bias = (-mean / std).view(3, 1, 1)
+
+        # her thread kendi buffer'ını kullanır, böylece aynı anda çalışan istekler birbirinin girişini ezmez
+        self._local = threading.local()
+
+    def _buffer(self, batch_size, height, width):
+        size = batch_size * 3 * height * width
+        storage = getattr(self._local, "storage", None)
+        if storage is None or storage.numel() < size:
+            storage = torch.empty(size, dtype=torch.float32)
+            self._local.storage = storage
+        return storage[:size].view(batch_size, 3, height, width)
+
+    def __call__(self, images, height, width):
+        """
+        PIL resimlerini (B, 3, height, width) boyutlu normalize edilmiş bir batch'e çevirir.
+        Küçük resimler sağdan ve alttan 0 ile (normalize uzayda ortalama renk) pad'lenir.
+        Dönen tensör bir sonraki çağrıda tekrar kullanılır, çağıran onu saklamamalıdır.
+        """
+        batch = self._buffer(len(images), height, width)
+
+        for index, image in enumerate(images):
+            pixels = torch.from_numpy(np.asarray(image)).permute(2, 0, 1) # (H, W, C) uint8 -> (C, H, W) view, kopya yok
+            h, w = pixels.shape[1], pixels.shape[2]
+
+            # uint8 -> float32 dönüşümü, ölçekleme ve normalizasyon tek adımda: bias + pixels * scale
+            torch.addcmul(self.bias, pixels, self.scale, out=batch[index, :, :h, :w])
+
+            if h < height:
+                batch[index, :, h:, :].zero_()
+            if w < width:
+                batch[index, :, :h, w:].zero_()
+
+        if self.device.type != "cpu":
+            return batch.to(self.device, non_blocking=True)
+        return batch
+
+
+# load_model ile kurulmamış (örneğin başka yerde oluşturulmuş) modeller için hattı ilk kullanımda kurup modele iliştirir
+def get_preprocessor(model):
+    preprocessor = getattr(model, "preprocessor", None)
+    if preprocessor is None:
+        device = next(model.parameters()).device if hasattr(model, "parameters") else torch.device("cpu")
+        preprocessor = Preprocessor(device)
+        model.preprocessor = preprocessor
+    return preprocessor
@@ -0,0 +1,119 @@
+"""
+Çıkarım (inference) çözünürlüğü. Model, çalışma çözünürlüğünden (en fazla 1024x1024) bağımsız olarak kısa kenarı
+INFERENCE_SHORT_SIDE olacak şekilde küçültülmüş resim üzerinde çalışır; maske, resmin kendisi rehber (guide) alınarak
+kenarlara duyarlı biçimde çalışma çözünürlüğüne büyütülür.
+
+Hangi preset'in yeterli olduğunu görmek için gecikme / IoU raporu:
+    python -m ai.resolution --images samples/
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+# preset -> modele girecek resmin kısa kenarı (None: çalışma çözünürlüğünde, küçültmeden)
+PRESETS = {"full": None, "quality": 768, "balanced": 512, "fast": 384}
+
+INFERENCE_PRESET = os.getenv("INFERENCE_PRESET", "full")
+if INFERENCE_PRESET not in PRESETS:
+    raise ValueError(f"Unknown INFERENCE_PRESET {INFERENCE_PRESET!r}, expected one of {sorted(PRESETS)}")
+# doğrudan piksel değeri verilirse preset'i ezer
+INFERENCE_SHORT_SIDE = int(os.getenv("INFERENCE_SHORT_SIDE", "0")) or PRESETS[INFERENCE_PRESET]
+
+GUIDED_RADIUS = int(os.getenv("GUIDED_RADIUS", "2"))       # guided filter penceresi (düşük çözünürlükte piksel)
+GUIDED_EPS = float(os.getenv("GUIDED_EPS", "1e-3"))        # küçüldükçe maske resimdeki kenarlara daha sıkı yapışır
+
+
+# (genişlik, yükseklik) -> modele girecek boyut. Kısa kenar zaten short_side'dan küçükse resim büyütülmez
+def inference_size(size, short_side=INFERENCE_SHORT_SIDE):
+    width, height = size
+    if short_side is None or min(width, height) <= short_side:
+        return size
+    scale = short_side / min(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _box(x, radius):
+    return cv2.boxFilter(x, -1, (2 * radius + 1, 2 * radius + 1))
+
+
+def guided_upsample(score, guide, radius=GUIDED_RADIUS, eps=GUIDED_EPS):
+    """
+    Düşük çözünürlüklü ön plan skorunu (h, w, 0..1 float32) guide resminin (H, W, 3 uint8 RGB) boyutuna büyütür.
+    Fast guided filter: doğrusal katsayılar (a, b) düşük çözünürlükte hesaplanıp büyütülür ve tam çözünürlükteki
+    gri resme uygulanır (q = a * I + b). Böylece maske sınırları bilinear büyütmenin bulanık basamakları yerine
+    resimdeki gerçek kenarları takip eder, maliyet ise düşük çözünürlükte kalır.
+    """
+    height, width = guide.shape[:2]
+    full = cv2.cvtColor(guide, cv2.COLOR_RGB2GRAY).astype(np.float32) * (1.0 / 255.0)
+    low = cv2.resize(full, (score.shape[1], score.shape[0]), interpolation=cv2.INTER_AREA)
+
+    mean_i = _box(low, radius)
+    mean_p = _box(score, radius)
+    var_i = _box(low * low, radius) - mean_i * mean_i
+    cov_ip = _box(low * score, radius) - mean_i * mean_p
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+
+    a = cv2.resize(_box(a, radius), (width, height), interpolation=cv2.INTER_LINEAR)
+    b = cv2.resize(_box(b, radius), (width, height), interpolation=cv2.INTER_LINEAR)
+    return a * full + b
+
+
+def report(model, images, presets=PRESETS):
+    """Her preset için resim başına ortalama/p95 gecikme ve 'full' preset'ine göre ortalama/en düşük IoU"""
+    from ai.main import predict_masks
+    from ai.runtimes import mask_iou
+
+    reference = None
+    rows = []
+    for name, short_side in sorted(presets.items(), key=lambda item: -(item[1] or 1 << 30)):
+        predict_masks(model, images[:1], cache=None, short_side=short_side) # ısınma
+        latencies, masks = [], []
+        for image in images:
+            start = time.perf_counter()
+            masks.extend(predict_masks(model, [image], cache=None, short_side=short_side))
+            latencies.append(time.perf_counter() - start)
+        if reference is None:
+            reference = masks
+        ious = [mask_iou(a, b) for a, b in zip(reference, masks)]
+        rows.append({
+            "preset": name,
+            "short_side": short_side,
+            "mean_ms": round(1000 * float(np.mean(latencies)), 1),
+            "p95_ms": round(1000 * float(np.percentile(latencies, 95)), 1),
+            "mean_iou": round(float(np.mean(ious)), 4),
+            "min_iou": round(float(np.min(ious)), 4),
+        })
+    return rows
+
+
+def main():
+    from ai.main import load_image, load_model
+
+    parser = argparse.ArgumentParser(description="Latency vs IoU of the inference resolution presets")
+    parser.add_argument("--images", required=True, help="directory of representative images")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    images = [load_image(path) for path in sorted(glob.glob(os.path.join(args.images, "*")))]
+    if not images:
+        raise SystemExit(f"no images found in {args.images}")
+
+    rows = report(load_model(), images)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'preset':<10}{'short side':>12}{'mean ms':>10}{'p95 ms':>10}{'mean IoU':>10}{'min IoU':>10}")
+    for row in rows:
+        print(f"{row['preset']:<10}{str(row['short_side'] or '-'):>12}{row['mean_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['mean_iou']:>10}{row['min_iou']:>10}")
+
+
+if __name__ == "__main__":
+    main()
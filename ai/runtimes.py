@@ -0,0 +1,231 @@
+"""
+Seçilebilir çıkarım (inference) runtime'ları: eager, TorchScript (frozen), ONNX Runtime ve int8 quantize edilmiş ONNX.
+
+Backend INFERENCE_BACKEND ortam değişkeniyle seçilir. Dönüştürme ve doğruluk kontrolü:
+    python -m ai.runtimes export --backend onnx-int8-static --calibration-dir samples/
+    python -m ai.runtimes parity --backend onnx-int8-static --images samples/
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+import torch
+
+from ai.foreground import ForegroundSegmentation, output_key, FOREGROUND_HEAD
+from ai.model_store import MODEL_REVISION
+from ai.preprocess import Preprocessor
+from ai.workers import worker_threads
+
+BACKENDS = ("eager", "torchscript", "onnx", "onnx-int8-dynamic", "onnx-int8-static")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "eager")
+RUNTIME_DIR = os.getenv("RUNTIME_DIR", "./models/runtimes") # dönüştürülmüş modellerin saklandığı klasör
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))           # 0 -> available_cpus() // (WORKER_PROCESSES x INFERENCE_MAX_IN_FLIGHT) (ai.workers)
+
+_FILES = {
+    "torchscript": "deeplabv3_mobilenet_v3_large.ts.pt",
+    "onnx": "deeplabv3_mobilenet_v3_large.onnx",
+    "onnx-int8-dynamic": "deeplabv3_mobilenet_v3_large.int8-dynamic.onnx",
+    "onnx-int8-static": "deeplabv3_mobilenet_v3_large.int8-static.onnx",
+}
+
+
+# dönüştürülmüş dosyalar ağırlık sürümüne göre ayrı klasörde; MODEL_REVISION değişince eski export kullanılmasın.
+# Ön plan başlığıyla ("fg") export edilen modeller ayrı dosyalara yazılır
+def runtime_path(backend, key="out"):
+    name = _FILES[backend]
+    if key != "out":
+        stem, ext = name.split(".", 1)
+        name = f"{stem}.{key}.{ext}"
+    return os.path.join(RUNTIME_DIR, MODEL_REVISION, name)
+
+
+# Sadece tek çıktıyı ("out" ya da "fg") döndüren sarmalayıcı; TorchScript/ONNX dict çıktı ve aux başlığıyla uğraşmasın
+class _SegmentationOut(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.key = output_key(model)
+
+    def forward(self, x):
+        return self.model(x)[self.key]
+
+
+class TorchScriptEngine:
+    def __init__(self, module, device="cpu", key="out"):
+        self.module = module
+        self.key = key
+        self.preprocessor = Preprocessor(device)
+
+    def __call__(self, input_batch):
+        return {self.key: self.module(input_batch)}
+
+
+class OnnxEngine:
+    def __init__(self, path, key="out"):
+        self.key = key
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("onnxruntime is not installed, install it to use the ONNX backends")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = ONNX_THREADS or worker_threads()
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.preprocessor = Preprocessor("cpu")
+
+    def __call__(self, input_batch):
+        output = self.session.run(None, {self.input_name: input_batch.numpy()})[0]
+        return {self.key: torch.from_numpy(output)}
+
+
+def export_torchscript(model, path):
+    # trace, giriş boyutunu sabitlemez: çıktı boyutu x.shape'ten okunduğu için farklı boyutlarda da çalışır
+    with torch.no_grad():
+        module = torch.jit.trace(_SegmentationOut(model).eval(), torch.randn(1, 3, 512, 512))
+    module = torch.jit.freeze(module) # ağırlıkları sabit olarak gömer, conv+bn gibi katmanları birleştirir
+    torch.jit.save(module, path)
+
+
+def export_onnx(model, path):
+    dummy = torch.randn(1, 3, 512, 512)
+    key = output_key(model)
+    torch.onnx.export(_SegmentationOut(model).eval(), dummy, path, input_names=["input"], output_names=[key],
+                      dynamic_axes={"input": {0: "batch", 2: "height", 3: "width"}, key: {0: "batch", 2: "height", 3: "width"}},
+                      opset_version=17, dynamo=False)
+
+
+# Kalibrasyon resimleri: verilen klasördeki resimler, yoksa rastgele resimler (sadece deneme için, doğruluk düşer)
+def _calibration_images(calibration_dir, count=32, size=512):
+    from ai.main import load_image
+
+    paths = sorted(glob.glob(os.path.join(calibration_dir, "*"))) if calibration_dir else []
+    if paths:
+        for path in paths[:count]:
+            yield load_image(path)
+        return
+
+    print("warning: no calibration images given, calibrating on random noise")
+    from PIL import Image
+    rng = np.random.default_rng(0)
+    for _ in range(count):
+        yield Image.fromarray(rng.integers(0, 255, (size, size, 3), dtype=np.uint8))
+
+
+def quantize_onnx(source_path, path, static, calibration_dir=None):
+    from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_dynamic, quantize_static
+
+    if not static:
+        quantize_dynamic(source_path, path, weight_type=QuantType.QInt8)
+        return
+
+    preprocess = Preprocessor("cpu")
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self.images = iter(_calibration_images(calibration_dir))
+
+        def get_next(self):
+            image = next(self.images, None)
+            if image is None:
+                return None
+            return {"input": preprocess([image], image.size[1], image.size[0]).numpy().copy()}
+
+    quantize_static(source_path, path, _Reader(), activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+
+def export(model, backend, calibration_dir=None):
+    """Eager modeli istenen backend'e dönüştürüp RUNTIME_DIR'a yazar"""
+    key = output_key(model)
+    path = runtime_path(backend, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    model = model.cpu().eval()
+
+    if backend == "torchscript":
+        export_torchscript(model, path)
+    elif backend == "onnx":
+        export_onnx(model, path)
+    elif backend in ("onnx-int8-dynamic", "onnx-int8-static"):
+        if not os.path.exists(runtime_path("onnx", key)):
+            export_onnx(model, runtime_path("onnx", key))
+        quantize_onnx(runtime_path("onnx", key), path, static=backend == "onnx-int8-static", calibration_dir=calibration_dir)
+    else:
+        raise ValueError(f"Nothing to export for backend {backend!r}")
+    return path
+
+
+def build_engine(model, backend=INFERENCE_BACKEND, device="cpu"):
+    """
+    Eager modeli seçilen runtime'a çevirir. Dönen nesne model gibi çağrılır: engine(batch)["out"].
+    Dönüştürülmüş dosya yoksa (int8-static hariç) ilk açılışta oluşturulur.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND {backend!r}, expected one of {BACKENDS}")
+    if backend == "eager":
+        return model
+
+    key = output_key(model)
+    path = runtime_path(backend, key)
+    if not os.path.exists(path):
+        if backend == "onnx-int8-static":
+            raise RuntimeError(f"{path} not found, run `python -m ai.runtimes export --backend {backend} --calibration-dir <images>` first")
+        export(model, backend)
+
+    if backend == "torchscript":
+        # optimize_for_inference'ın ürettiği graf kaydedilemiyor, bu yüzden her yüklemede uyguluyoruz
+        module = torch.jit.optimize_for_inference(torch.jit.load(path, map_location=device))
+        return TorchScriptEngine(module, device, key)
+    return OnnxEngine(path, key)
+
+
+# iki maske arasındaki IoU (Intersection over Union); ikisi de boşsa 1
+def mask_iou(a, b):
+    a, b = a > 0, b > 0
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def parity(model, engine, images):
+    """Her resim için referans (eager) model ile engine'in ön plan maskeleri arasındaki IoU'yu döndürür"""
+    from ai.main import predict_masks
+
+    expected = predict_masks(model, images, cache=None)
+    actual = predict_masks(engine, images, cache=None)
+    return [mask_iou(a, b) for a, b in zip(expected, actual)]
+
+
+def main():
+    from ai.main import load_image, load_eager_model
+
+    parser = argparse.ArgumentParser(description="Export inference runtimes and check their parity with eager mode")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export")
+    export_parser.add_argument("--backend", choices=BACKENDS[1:], required=True)
+    export_parser.add_argument("--calibration-dir", help="images used to calibrate static int8 quantization")
+    parity_parser = sub.add_parser("parity")
+    parity_parser.add_argument("--backend", choices=BACKENDS, required=True)
+    parity_parser.add_argument("--images", help="directory of images to compare on (random images if omitted)")
+    parity_parser.add_argument("--min-iou", type=float, default=0.95)
+    args = parser.parse_args()
+
+    # referans her zaman 21 sınıflı eager model; FOREGROUND_HEAD açıksa başlığın farkı da ölçülür
+    reference = load_eager_model()
+    model = ForegroundSegmentation(reference) if FOREGROUND_HEAD else reference
+    if args.command == "export":
+        print(f"exported {export(model, args.backend, args.calibration_dir)}")
+        return
+
+    engine = build_engine(model, args.backend)
+    paths = sorted(glob.glob(os.path.join(args.images, "*"))) if args.images else []
+    images = [load_image(path) for path in paths] or list(_calibration_images(None, count=8))
+    ious = parity(reference, engine, images)
+    print(f"{args.backend}: mean IoU {np.mean(ious):.4f}, min IoU {np.min(ious):.4f} over {len(ious)} images")
+    if np.min(ious) < args.min_iou:
+        raise SystemExit(f"parity check failed: min IoU below {args.min_iou}")
+
+
+if __name__ == "__main__":
+    main()
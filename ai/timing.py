@@ -0,0 +1,19 @@
+"""Arkaplan kaldırma akışının aşama (stage) sürelerini ölçmek için küçük yardımcılar"""
+
+import time
+from contextlib import contextmanager
+
+
+# with stage(timings, "forward"): ... bloğunun süresini saniye cinsinden timings["forward"]'a ekler.
+# timings None ise hiçbir şey ölçülmez, yani sıcak yolda (hot path) ek maliyeti yok denecek kadar azdır
+@contextmanager
+def stage(timings, name):
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
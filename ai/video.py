@@ -0,0 +1,176 @@
+"""
+Video ya da kare dizisi (klasör / glob) için arkaplan kaldırma. Kareler ai.main.remove_background_stream'den geçer;
+decode ve encode ayrı thread'lerde, küçük sınırlı kuyruklarla çalışır. Böylece decode, model ve yazma birbirini
+beklemeden ilerler ve bellekte klibin uzunluğundan bağımsız olarak sadece birkaç kare bulunur.
+
+Çıktı:
+    klasör    -> her kare için RGBA PNG (frame_000000.png, ...)
+    .mp4/.avi -> siyah/beyaz alfa maskesi (matte) videosu, kurgu programlarında track matte olarak kullanılabilir
+
+Kullanım:
+    python -m ai.video clip.mp4 --output frames/
+    python -m ai.video "shots/*.png" --output matte.mp4 --fps 25
+"""
+
+import argparse
+import glob
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from ai.encoding import OUTPUT_PNG_COMPRESS_LEVEL
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+PIPELINE_DEPTH = 4 # decode ve encode kuyruklarında bekleyebilecek en fazla kare
+_DONE = object()
+
+
+def _image_paths(source):
+    paths = [os.path.join(source, name) for name in os.listdir(source)] if os.path.isdir(source) else glob.glob(source)
+    return sorted(path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def read_frames(source):
+    """(kare generator'ı, fps) döndürür. Klasör ve glob'lar isim sırasıyla okunur, diğer her şey video kabul edilir"""
+    paths = _image_paths(source) if os.path.isdir(source) or glob.has_magic(source) else None
+    if paths is not None:
+        return (Image.open(path) for path in paths), None
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {source}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or None
+
+    def frames():
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    return
+                yield Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        finally:
+            capture.release()
+
+    return frames(), fps
+
+
+# iterable'ı arka plandaki bir thread'de en fazla depth eleman önden okuyarak akıtır
+def prefetch(iterable, depth=PIPELINE_DEPTH):
+    items = queue.Queue(depth)
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        items.put(_DONE)
+
+    threading.Thread(target=produce, name="video-decode", daemon=True).start()
+    while True:
+        item = items.get()
+        if item is _DONE:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+class FrameWriter:
+    """Sonuç karelerini arka plandaki bir thread'de yazar; kuyruk doluysa write() bekler (bellek sınırlı kalır)"""
+
+    def __init__(self, output, fps=None, depth=PIPELINE_DEPTH):
+        self.output = output
+        self.fps = fps or 25.0
+        self.count = 0
+        self._video = None
+        self._error = None
+        self._queue = queue.Queue(depth)
+        if not output.lower().endswith((".mp4", ".avi")):
+            os.makedirs(output, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="video-encode", daemon=True)
+        self._thread.start()
+
+    def write(self, image):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(image)
+
+    def close(self):
+        self._queue.put(_DONE)
+        self._thread.join()
+        if self._video is not None:
+            self._video.release()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            image = self._queue.get()
+            if image is _DONE:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._write(image)
+            except Exception as e:
+                self._error = e
+
+    def _write(self, image):
+        if os.path.isdir(self.output):
+            image.save(os.path.join(self.output, f"frame_{self.count:06d}.png"), compress_level=OUTPUT_PNG_COMPRESS_LEVEL)
+        else:
+            alpha = np.asarray(image.getchannel("A"))
+            if self._video is None:
+                fourcc = cv2.VideoWriter_fourcc(*("mp4v" if self.output.lower().endswith(".mp4") else "MJPG"))
+                self._video = cv2.VideoWriter(self.output, fourcc, self.fps, (alpha.shape[1], alpha.shape[0]), isColor=False)
+            self._video.write(alpha)
+        self.count += 1
+
+
+def process(model, source, output, fps=None, **options):
+    """source'taki kareleri işleyip output'a yazar; kare türlerinin sayısını ve süreyi döndürür"""
+    from ai.main import remove_background_stream
+
+    frames, source_fps = read_frames(source)
+    writer = FrameWriter(output, fps or source_fps)
+    stats = {}
+    start = time.perf_counter()
+    try:
+        for result in remove_background_stream(model, prefetch(frames), stats=stats, **options):
+            writer.write(result)
+    finally:
+        writer.close()
+    stats["frames"] = writer.count
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    return stats
+
+
+def main():
+    from ai.main import create_model, FRAME_KEY, FRAME_FAST, FRAME_PROPAGATED
+
+    parser = argparse.ArgumentParser(description="Remove the background of a video or an image sequence")
+    parser.add_argument("source", help="video file, directory of frames or a quoted glob pattern")
+    parser.add_argument("--output", required=True, help="directory for RGBA PNG frames, or .mp4/.avi for an alpha matte video")
+    parser.add_argument("--fps", type=float, default=None, help="output frame rate for matte videos (default: source fps or 25)")
+    parser.add_argument("--skip-threshold", type=float, default=None, help="frame change below which the previous mask is reused")
+    parser.add_argument("--keyframe-threshold", type=float, default=None, help="frame change above which full resolution inference runs")
+    parser.add_argument("--max-interval", type=int, default=None, help="force a full resolution keyframe at least this often")
+    args = parser.parse_args()
+
+    options = {name: value for name, value in (("skip_threshold", args.skip_threshold),
+                                               ("keyframe_threshold", args.keyframe_threshold),
+                                               ("max_interval", args.max_interval)) if value is not None}
+    stats = process(create_model(), args.source, args.output, args.fps, **options)
+    rate = stats["frames"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"{stats['frames']} frames in {stats['seconds']}s ({rate:.2f} fps): "
+          + ", ".join(f"{stats.get(kind, 0)} {kind}" for kind in (FRAME_KEY, FRAME_FAST, FRAME_PROPAGATED)))
+
+
+if __name__ == "__main__":
+    main()
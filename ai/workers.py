@@ -0,0 +1,105 @@
+"""
+Aynı makinede birden fazla worker process'i (Streamlit replikaları, uvicorn worker'ları) çalıştırmak için yardımcılar.
+
+- Thread sayısı: her forward pass torch'u (ve ONNX Runtime'ı) available_cpus() // (WORKER_PROCESSES x
+  INFERENCE_MAX_IN_FLIGHT) thread ile çalıştırır; her biri bütün çekirdekleri kullanmaya çalışırsa birbirini yavaşlatır.
+- Bellek: ağırlıklar MODEL_SHARED_WEIGHTS ile dosyadan mmap'lenip paylaşılır (ai.model_store). memory_usage()
+  bir process'in sadece kendisine ait (USS) ve paylaşılan belleğini raporlar; node başına kaç worker sığacağı
+  USS'e göre hesaplanır.
+
+Paylaşımı ölçmek için N worker başlatıp her birinin belleğini raporlar:
+    python -m ai.workers --workers 4
+    python -m ai.workers --workers 4 --copy-weights   # karşılaştırma: her worker kendi kopyasıyla
+"""
+
+import argparse
+import multiprocessing
+import os
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1")) # bu makinede model yükleyen process sayısı
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0"))       # 0 -> available_cpus() // (WORKER_PROCESSES x INFERENCE_MAX_IN_FLIGHT)
+INFERENCE_MAX_IN_FLIGHT = int(os.getenv("INFERENCE_MAX_IN_FLIGHT", "1")) # bir process'te aynı anda modelden geçen batch sayısı
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0)) # container'a/taskset'e verilen çekirdekler
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# aynı anda çalışan her forward pass'e düşen çekirdek sayısı; toplamda çekirdeklerden fazla thread açılmasın
+def worker_threads(workers=WORKER_PROCESSES, in_flight=INFERENCE_MAX_IN_FLIGHT):
+    return TORCH_THREADS or max(1, available_cpus() // (max(1, workers) * max(1, in_flight)))
+
+
+def configure_threads(workers=WORKER_PROCESSES):
+    import torch
+
+    threads = worker_threads(workers)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1 if workers > 1 or INFERENCE_MAX_IN_FLIGHT > 1 else threads)
+    except RuntimeError: # sadece ilk paralel işten önce ayarlanabiliyor
+        pass
+    return threads
+
+
+def memory_usage():
+    """
+    Bu process'in belleği (byte): rss (toplam), pss (paylaşılan sayfalar paylaşanlar arasında bölünmüş),
+    uss (sadece bu process'e ait, process kapanınca geri kazanılacak olan) ve shared. Linux dışında None.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {"rss": fields.get("Rss", 0), "pss": fields.get("Pss", 0), "uss": uss,
+            "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)}
+
+
+def _worker(index, workers, barrier, results):
+    from PIL import Image
+    from ai.main import create_model, predict_masks
+
+    threads = configure_threads(workers)
+    model = create_model()
+    predict_masks(model, [Image.new("RGB", (512, 512))], cache=None) # bir forward pass: ağırlıkların hepsine dokunulur
+    barrier.wait() # herkes yüklensin ki PSS paylaşımı yansıtsın
+    results.put((index, threads, memory_usage()))
+    barrier.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start N model workers and report their per-process memory")
+    parser.add_argument("--workers", type=int, default=max(2, WORKER_PROCESSES))
+    parser.add_argument("--copy-weights", action="store_true", help="give every worker its own copy of the weights (MODEL_SHARED_WEIGHTS=0)")
+    args = parser.parse_args()
+
+    # spawn'lanan worker'lar ortam değişkenlerini bu process'ten alır
+    os.environ["MODEL_SHARED_WEIGHTS"] = "0" if args.copy_weights else "1"
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(args.workers), context.Queue()
+    processes = [context.Process(target=_worker, args=(index, args.workers, barrier, results)) for index in range(args.workers)]
+    for process in processes:
+        process.start()
+    reports = sorted(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+
+    mb = 1024 * 1024
+    for index, threads, memory in reports:
+        print(f"worker {index}: {threads} threads  uss {memory['uss'] / mb:7.1f} MB  pss {memory['pss'] / mb:7.1f} MB"
+              f"  rss {memory['rss'] / mb:7.1f} MB  shared {memory['shared'] / mb:7.1f} MB")
+    print(f"total uss {sum(memory['uss'] for _, _, memory in reports) / mb:.1f} MB, "
+          f"total pss {sum(memory['pss'] for _, _, memory in reports) / mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
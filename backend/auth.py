@@ -4,6 +4,7 @@ import os
 from datetime import timedelta, datetime, timezone
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from starlette import status
 from starlette.responses import RedirectResponse
 from sqlalchemy.orm import Session
@@ -12,8 +13,9 @@ from authlib.integrations.starlette_client import OAuth # Google bağlantısı i
 from dotenv import load_dotenv
 
 # proje içindeki dosyalarım
-from db.database import SessionLocal
+from db.database import get_db
 from db.tables import Users
+from backend.auth_cache import auth_cache, UserSnapshot
 
 load_dotenv(override=True)
 
@@ -31,13 +33,7 @@ oauth.register(name="google", client_id=os.getenv("GOOGLE_CLIENT_ID"), client_se
                client_kwargs={"scope": "openid email profile"} # Google'dan hangi verileri istiyoruz?
                )
 
-# 2. DB bağlantısı
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# 2. DB bağlantısı (db/database.py'deki ortak get_db)
 
 db_dependency = Annotated[Session, Depends(get_db)] # database'e get, post, delete, update yapacak olan tüm fonksiyonların get_db, yani database'e bağlanma fonksiyonundan depend etmesini sağlayan satır
 
@@ -48,6 +44,10 @@ def create_access_token(user_id:int, email:str, expires_delta: timedelta): # kul
     payload.update({"exp": expires})
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
+def load_user_snapshot(db, user_id):
+    user = db.query(Users).filter(Users.id == user_id).first()
+    return UserSnapshot.from_user(user) if user is not None else None
+
 # 4. Token Doğrulama - Şu anki kullanıcıyı bulma
 async def get_current_user(request: Request, db:Session = Depends(get_db)): # tokenin decoding(şifre çözme) kısmı. user'ın göndermiş olduğu token gerçekten var mı diye kontrol etme. Verify etme. Atılan isteklerin gerçekten bizim kullanıcılarımız tarafından gelip gelmediğini teyit edebilicez. Örneğin buradaki payload.get('id') sayesinde sadece o id'ye kayıtlı olan removedbackground fotolarını gösterebilcez
     token = request.cookies.get("access_token")
@@ -58,14 +58,20 @@ async def get_current_user(request: Request, db:Session = Depends(get_db)): # to
     if token.startswith("Bearer "):
         token = token.split(" ")[1]
 
+    # bu token daha önce doğrulandıysa ne JWT'yi tekrar çözüyoruz ne de DB'ye gidiyoruz. Kayıt en geç token'ın exp'inde düşer
+    cached_user = auth_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("id")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid User")
-        user = db.query(Users).filter(Users.id == user_id).first() # Veritabanından kullanıcıyı teyit ediyoruz
+        user = await run_in_threadpool(load_user_snapshot, db, user_id) # Veritabanından kullanıcıyı teyit ediyoruz (event loop'u bloklamadan)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
+        auth_cache.put(token, user, payload.get("exp", 0))
         return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Token not verified")
@@ -106,6 +112,11 @@ async def auth_callback(request: Request, db:db_dependency):
         db.add(user)
         db.commit()
         db.refresh(user)
+    elif user.email != google_email or user.full_name != google_name: # Google tarafında bilgileri değişmişse güncelle
+        user.email = google_email
+        user.full_name = google_name
+        db.commit()
+        auth_cache.invalidate_user(user.id) # önbellekteki eski bilgiler bir daha dönmesin
 
     # DB'ye yeni kaydedilen kullanıcı verileriyle 60dklık bir token oluştur
     my_access_token = create_access_token(user_id=user.id, email = user.email, expires_delta=timedelta(minutes=60)) # Login SignIn esnasısnda burada token oluşturuluyor
@@ -141,7 +152,11 @@ Dolayısıyla kullanıcının tekrar giriş yapması gerekir, yine aynı döngü
 
 
 @router.get("/logout")
-async def logout():
+async def logout(request: Request):
+    token = request.cookies.get("access_token")
+    if token:
+        auth_cache.invalidate_token(token.removeprefix("Bearer "))
+
     response = RedirectResponse(url = FRONTEND_URL)
     response.delete_cookie("access_token")
     return response
@@ -0,0 +1,80 @@
+"""Doğrulanmış token -> kullanıcı bilgisi önbelleği. get_current_user her istekte JWT çözüp DB'ye gitmesin diye"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from cachetools import TLRUCache
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000")) # aynı anda saklanacak en fazla token sayısı
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))     # bir kaydın en fazla kaç saniye saklanacağı, 0 ise önbellek kapalı
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Users satırının oturuma (session) bağlı olmayan, değiştirilemez bir kopyası"""
+    id: int
+    google_sub_id: str
+    email: str
+    full_name: str
+    created_at: datetime | None
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(id=user.id, google_sub_id=user.google_sub_id, email=user.email, full_name=user.full_name, created_at=user.created_at)
+
+
+class AuthCache:
+    def __init__(self, maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL):
+        self.ttl = ttl
+        # her kayıt ya ttl dolunca ya da token'ın exp zamanı gelince (hangisi önceyse) düşer
+        self._cache = TLRUCache(maxsize=maxsize, ttu=lambda token, entry, now: min(now + ttl, entry[1]), timer=time.time)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token):
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token, user, expires_at):
+        if self.ttl <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._cache[token] = (user, expires_at)
+
+    def invalidate_token(self, token):
+        with self._lock:
+            if self._cache.pop(token, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            tokens = [token for token, (user, _) in self._cache.items() if user.id == user_id]
+            for token in tokens:
+                del self._cache[token]
+            self.invalidations += len(tokens)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "invalidations": self.invalidations,
+                "size": len(self._cache),
+            }
+
+
+auth_cache = AuthCache()
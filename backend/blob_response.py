@@ -0,0 +1,113 @@
+"""Blob'ları ham byte olarak (base64/JSON olmadan) ETag, koşullu GET (304) ve Range (206) desteğiyle akıtan cevaplar"""
+
+import hashlib
+
+from starlette import status
+from starlette.responses import Response, StreamingResponse
+
+from backend.metrics import BLOB_BYTES
+from db.blob_store import blob_store, CHUNK_SIZE
+
+# id ile adreslenen resmin içeriği değişebilir (post-processed-picture ile güncellenebilir), bu yüzden
+# tarayıcı/istemci her seferinde ETag ile sorar; değişmediyse cevap gövdesiz bir 304'tür
+CACHE_CONTROL = "private, no-cache"
+
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+
+# dosyanın ilk byte'larına bakarak Content-Type'ı bulur
+def sniff_media_type(head):
+    for signature, media_type in _SIGNATURES:
+        if head.startswith(signature):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def _etag_matches(header, etag):
+    if header is None:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+# "bytes=start-end" başlığını (start, end) aralığına çevirir. Tek aralık destekleniyor; geçersizse None
+def _parse_range(header, size):
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes="):].strip().partition("-")
+    try:
+        if start == "":
+            length = int(end)
+            if length <= 0:
+                return None
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _iter_blob(ref, start, length):
+    with blob_store.open(ref) as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def blob_response(request, ref=None, size=None, data=None):
+    """
+    ref verilirse blob store'dan parça parça akıtır; eski (migrate edilmemiş) kayıtlar için data ile bytes verilebilir.
+    """
+    if ref is None:
+        ref = hashlib.sha256(data).hexdigest()
+        size = len(data)
+    elif size is None:
+        size = blob_store.size(ref)
+
+    BLOB_BYTES.observe(size, operation="read")
+    etag = f'"{ref}"' # içerik hash'i olduğu için güçlü (strong) ETag
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Accept-Ranges": "bytes"}
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if data is not None:
+        head = data[:16]
+    else:
+        with blob_store.open(ref) as f:
+            head = f.read(16)
+    media_type = sniff_media_type(head)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers)
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        start, end = 0, size - 1
+
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    status_code = status.HTTP_206_PARTIAL_CONTENT if "Content-Range" in headers else status.HTTP_200_OK
+
+    if data is not None:
+        return Response(content=data[start:end + 1], status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(_iter_blob(ref, start, length), status_code=status_code, headers=headers, media_type=media_type)
@@ -0,0 +1,205 @@
+"""
+Toplu yükleme: tek istekte gelen çok sayıda resmi kaydedip arkaplanlarını batch'ler halinde kaldırır.
+
+Yüklenen dosyalar (Starlette'in SpooledTemporaryFile'ı sayesinde) bellekte değil diskte bekler, tek tek ve parça parça
+blob store'a kopyalanır (zip içindekiler de açılırken) ve tüm satırlar tek bir transaction'da eklenir. Çıkarım ayrı bir thread'de, BatchScheduler'ın batch boyutunda
+parçalar halinde yapılır; her parçanın sonuçları da tek commit ile yazılır. Böylece toplu yükleme HTTP ve SQLite
+commit maliyetiyle değil modelin hızıyla sınırlanır.
+"""
+
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import UnidentifiedImageError
+
+from ai.batching import Overloaded
+from ai.main import ImageTooLargeError
+from ai.encoding import encode_image, normalize_format
+from backend.jobs import job_queue, get_scheduler, QUEUED, RUNNING, DONE, FAILED, JOB_TTL_SECONDS, QueueFullError
+from backend.model_loader import model_loader
+from backend.picture_storage import save_picture_bytes, save_picture_file
+from backend.thumbnails import create_thumbnail
+from db.blob_store import blob_store, BlobTooLargeError
+from db.database import SessionLocal
+from db.tables import Pictures
+
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "500"))     # bir toplu yüklemedeki en fazla resim sayısı
+BULK_MAX_PENDING = int(os.getenv("BULK_MAX_PENDING", "4"))   # sırada bekleyebilecek en fazla toplu yükleme
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+
+class BulkItem:
+    def __init__(self, index, name):
+        self.index = index
+        self.name = name
+        self.status = QUEUED
+        self.picture_id = None
+        self.original_ref = None
+        self.error = None
+
+    def to_dict(self):
+        return {"index": self.index, "name": self.name, "status": self.status, "picture_id": self.picture_id, "error": self.error}
+
+
+class BulkBatch:
+    def __init__(self, user_id, output_format=None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.output_format = normalize_format(output_format)
+        self.items = []
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def status(self):
+        if self.finished_at is not None:
+            return DONE
+        return RUNNING if any(item.status != QUEUED for item in self.items) else QUEUED
+
+    def to_dict(self):
+        counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED)}
+        for item in self.items:
+            counts[item.status] += 1
+        return {"batch_id": self.id, "status": self.status, "format": self.output_format, "total": len(self.items),
+                "counts": counts, "items": [item.to_dict() for item in self.items]}
+
+
+# multipart dosyalarını ve zip içindekileri (isim, dosya nesnesini açan fonksiyon) olarak listeler; içerik henüz okunmaz,
+# böylece dosya sayısı sınırı blob store'a bir şey yazılmadan kontrol edilir
+def collect_uploads(pictures, archive):
+    uploads = [(picture.filename or "", lambda picture=picture: picture.file) for picture in pictures or ()]
+    if archive is not None:
+        zipped = zipfile.ZipFile(archive.file)
+        uploads += [(info.filename, lambda info=info: zipped.open(info)) for info in zipped.infolist()
+                    if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)]
+    if not uploads:
+        raise ValueError("No images were uploaded")
+    if len(uploads) > BULK_MAX_FILES:
+        raise ValueError(f"A bulk upload may contain at most {BULK_MAX_FILES} images")
+    return uploads
+
+
+class BulkQueue:
+    def __init__(self, max_pending=BULK_MAX_PENDING):
+        # toplu işler sırayla yürür; paralellik BatchScheduler'ın batch'lerinden gelir, model için ikinci bir yarış açmıyoruz
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def submit(self, db, user_id, uploads, output_format=None):
+        batch = BulkBatch(user_id, output_format)
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Bulk queue is full", job_queue.retry_after())
+        try:
+            self._ingest(db, batch, uploads)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._prune()
+            self._batches[batch.id] = batch
+        self._executor.submit(self._run, batch)
+        return batch
+
+    def get(self, batch_id, user_id):
+        with self._lock:
+            batch = self._batches.get(batch_id)
+        if batch is None or batch.user_id != user_id:
+            return None
+        return batch
+
+    def _prune(self):
+        now = time.time()
+        expired = [batch_id for batch_id, batch in self._batches.items() if batch.finished_at and now - batch.finished_at > JOB_TTL_SECONDS]
+        for batch_id in expired:
+            del self._batches[batch_id]
+
+    def _ingest(self, db, batch, uploads):
+        pictures = []
+        for index, (name, open_upload) in enumerate(uploads):
+            item = BulkItem(index, name)
+            batch.items.append(item)
+            # resim olmayan ya da sınırları aşan dosyalar satır oluşturmasın, diğerleri işlenmeye devam etsin
+            try:
+                with open_upload() as f:
+                    item.original_ref, original_size = save_picture_file(f)
+            except UnidentifiedImageError:
+                item.status, item.error = FAILED, "Uploaded file is not an image"
+                continue
+            except (ImageTooLargeError, BlobTooLargeError) as e:
+                item.status, item.error = FAILED, str(e)
+                continue
+
+            pictures.append((item, Pictures(user_id=batch.user_id, original_ref=item.original_ref, original_size=original_size)))
+
+        # tüm satırlar tek transaction'da; flush id'leri verir, commit sonrası satırları tekrar okumaya gerek kalmaz
+        db.add_all([picture for _, picture in pictures])
+        db.flush()
+        for item, picture in pictures:
+            item.picture_id = picture.id
+        db.commit()
+
+    def _run(self, batch):
+        try:
+            scheduler = get_scheduler()
+            items = [item for item in batch.items if item.status == QUEUED]
+            size = scheduler.max_batch_size
+            for start in range(0, len(items), size):
+                self._run_chunk(scheduler, batch, items[start:start + size])
+        except Exception as e:
+            for item in batch.items:
+                if item.status in (QUEUED, RUNNING):
+                    item.status, item.error = FAILED, str(e)
+        finally:
+            batch.finished_at = time.time()
+            self._slots.release()
+
+    # toplu iş arka plan işidir: zamanlayıcı doluysa etkileşimli isteklere yer açıp Retry-After kadar bekler, son süresi yok
+    @staticmethod
+    def _submit(scheduler, ref):
+        while True:
+            with blob_store.open(ref) as f: # resim submit sırasında küçültülerek açılır
+                future = scheduler.submit(f, deadline_ms=None)
+            if not (future.done() and isinstance(future.exception(), Overloaded)):
+                return future
+            time.sleep(future.exception().retry_after)
+
+    def _run_chunk(self, scheduler, batch, items):
+        for item in items:
+            item.status = RUNNING
+        # parçanın tamamı birden scheduler'a verilir, tek forward pass'te işlenir
+        futures = [self._submit(scheduler, item.original_ref) for item in items]
+
+        db = SessionLocal()
+        try:
+            rows = {picture.id: picture for picture in
+                    db.query(Pictures).filter(Pictures.id.in_([item.picture_id for item in items])).all()}
+            finished = []
+            for item, future in zip(items, futures):
+                picture = rows.get(item.picture_id)
+                try:
+                    if picture is None:
+                        raise LookupError("Picture was deleted")
+                    processed = encode_image(future.result(), batch.output_format).data
+                    picture.processed_ref, picture.processed_size = save_picture_bytes(processed)
+                    create_thumbnail(picture, "original")
+                    create_thumbnail(picture, "processed", processed)
+                    finished.append(item)
+                except Exception as e:
+                    item.status, item.error = FAILED, str(e)
+            db.commit() # parçanın bütün sonuçları tek commit'te
+        finally:
+            db.close()
+
+        for item in finished:
+            item.status = DONE
+        model_loader.record_result()
+
+
+bulk_queue = BulkQueue()
@@ -0,0 +1,177 @@
+"""Sunucu tarafında arkaplan kaldırma işleri (job) için sınırlı bir worker havuzu ve iş durumu kaydı"""
+
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from ai.main import remove_background_cached
+from ai.batching import Overloaded, INFERENCE_DEADLINE_MS
+from ai.encoding import encode_image, normalize_format
+from backend.model_loader import model_loader
+from backend.metrics import JOBS
+from backend.picture_storage import save_picture_bytes
+from backend.thumbnails import create_thumbnail
+from db.blob_store import blob_store
+from db.database import SessionLocal
+from db.tables import Pictures
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))        # aynı anda modeli çalıştıracak worker sayısı
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "32")) # bekleyebilecek en fazla iş sayısı, dolunca yeni işler reddedilir
+INFERENCE_MAX_PER_USER = int(os.getenv("INFERENCE_MAX_PER_USER", "4")) # bir kullanıcının aynı anda bekleyen en fazla işi (aşılırsa 429)
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))         # biten işlerin durumunun hafızada tutulacağı süre
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+# retry_after: istemcinin kaç saniye sonra tekrar denemesi gerektiği (Retry-After başlığı)
+class QueueFullError(Exception):
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# tek bir kullanıcı kuyruğu doldurmasın: sunucu değil o kullanıcı fazla istek atıyor (429)
+class TooManyJobsError(QueueFullError):
+    pass
+
+
+class Job:
+    def __init__(self, user_id, output_format=None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.output_format = normalize_format(output_format) # png / webp / mask, geçersizse ValueError
+        self.status = QUEUED
+        self.picture_id = None
+        self.error = None
+        self.created_at = time.time()
+        self.deadline = None # time.monotonic() cinsinden; geçerse iş modele girmeden düşürülür
+        self.finished_at = None
+
+    def to_dict(self):
+        return {"job_id": self.id, "status": self.status, "picture_id": self.picture_id, "error": self.error,
+                "format": self.output_format}
+
+
+# model backend.model_loader'da arka planda yüklenip ısıtılıyor; hazır değilse worker onu bekler
+def get_scheduler():
+    return model_loader.get()
+
+
+class JobQueue:
+    def __init__(self, workers=INFERENCE_WORKERS, max_pending=INFERENCE_QUEUE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    # original_ref: blob store'a yazılmış (save_picture_file) yüklenen resim; işler resmin byte'larını değil ref'ini tutar
+    def submit(self, user_id, original_ref, original_size, output_format=None, deadline_ms=INFERENCE_DEADLINE_MS):
+        job = Job(user_id, output_format)
+        original = (original_ref, original_size)
+
+        # maske önbellekteyse iş kuyruğa hiç girmez, sonuç hemen kaydedilir
+        with blob_store.open(original_ref) as f:
+            cached_image = remove_background_cached(f)
+        if cached_image is not None:
+            self._track(job)
+            self._finish(job, original, cached_image)
+            return job
+
+        self._admit(user_id, deadline_ms)
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Inference queue is full", self.retry_after())
+
+        job.deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+        self._track(job)
+        self._executor.submit(self._run, job, original)
+        return job
+
+    def get(self, job_id, user_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    def pending(self, user_id=None):
+        with self._lock:
+            return sum(1 for job in self._jobs.values()
+                       if job.status in (QUEUED, RUNNING) and (user_id is None or job.user_id == user_id))
+
+    # bu iş kuyruğa girerse modele girene kadar tahmini bekleme; model henüz hazır değilse bilinmiyor (0)
+    def estimated_wait(self):
+        scheduler = model_loader.scheduler()
+        return scheduler.estimated_wait(extra=self.pending()) if scheduler is not None else 0.0
+
+    def retry_after(self):
+        return max(1, math.ceil(self.estimated_wait()))
+
+    # kabul kontrolü: kullanıcı başına sınır (429) ve tahmini bekleme son süreyi aşıyorsa hemen ret (503)
+    def _admit(self, user_id, deadline_ms):
+        if self.pending(user_id) >= INFERENCE_MAX_PER_USER:
+            raise TooManyJobsError("Too many pending jobs for this user", self.retry_after())
+        if deadline_ms and self.estimated_wait() > deadline_ms / 1000:
+            raise QueueFullError("Estimated wait exceeds the deadline", self.retry_after())
+
+    def _track(self, job):
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+
+    def _prune(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished_at and now - job.finished_at > JOB_TTL_SECONDS]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _run(self, job, original):
+        job.status = RUNNING
+        try:
+            remaining_ms = (job.deadline - time.monotonic()) * 1000 if job.deadline is not None else None
+            if remaining_ms is not None and remaining_ms <= 0:
+                raise Overloaded("Deadline exceeded while waiting for a worker", self.retry_after())
+            with blob_store.open(original[0]) as f: # resim submit sırasında (küçültülerek) açılır, dosya sonra kapanabilir
+                future = get_scheduler().submit(f, deadline_ms=remaining_ms)
+            self._finish(job, original, future.result())
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            job.finished_at = time.time()
+            JOBS.inc(status=FAILED)
+            # yüklenen orijinal burada silinmez: aynı içerik başka bir istekte yazılmış ve satırı henüz commit edilmemiş
+            # olabilir. Satırı hiç oluşmayan blob, BLOB_RELEASE_GRACE_SECONDS dolunca retention süpürücüsünce toplanır
+        finally:
+            self._slots.release()
+
+    def _finish(self, job, original, result_image):
+        # sonuç bir kere encode edilir; aynı byte'lar hem blob store'a hem önizleme oluşturmaya gider
+        processed = encode_image(result_image, job.output_format).data
+
+        original_ref, original_size = original
+        processed_ref, processed_size = save_picture_bytes(processed)
+
+        # orijinal ve işlenmiş resmi tek bir transaction'da yazıyoruz
+        db = SessionLocal()
+        try:
+            picture = Pictures(user_id=job.user_id,
+                               original_ref=original_ref, original_size=original_size,
+                               processed_ref=processed_ref, processed_size=processed_size)
+            # worker zaten istek yolunun dışında çalıştığı için önizlemeleri yazarken oluşturuyoruz
+            create_thumbnail(picture, "original")
+            create_thumbnail(picture, "processed", processed)
+            db.add(picture)
+            db.commit()
+            job.picture_id = picture.id
+        finally:
+            db.close()
+
+        job.status = DONE
+        job.finished_at = time.time()
+        JOBS.inc(status=DONE)
+        model_loader.record_result()
+
+
+job_queue = JobQueue()
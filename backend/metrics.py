@@ -0,0 +1,97 @@
+"""Backend metrikleri: istek süreleri, SQL sorgu süreleri, blob boyutları, base64 süreleri ve kuyruk derinlikleri"""
+
+import base64
+import os
+import time
+
+from sqlalchemy import event
+
+from ai.metrics import REGISTRY, add_request_timing, request_timings
+from ai.workers import memory_usage
+
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "0") == "1" # 1 -> her cevaba Server-Timing başlığı eklenir
+
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SIZE_BUCKETS = tuple(1024 * 4 ** power for power in range(8)) # 1 KB .. 16 MB
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram("http_request_seconds", "HTTP request latency", labels=("method", "handler", "status"))
+DB_QUERY_SECONDS = REGISTRY.histogram("db_query_seconds", "SQL statement execution time", labels=("operation",), buckets=DB_BUCKETS)
+BLOB_BYTES = REGISTRY.histogram("blob_bytes", "Size of image blobs read and written", labels=("operation",), buckets=SIZE_BUCKETS)
+BASE64_SECONDS = REGISTRY.histogram("base64_seconds", "Time spent encoding/decoding base64 image payloads",
+                                    labels=("operation",), buckets=DB_BUCKETS)
+JOBS = REGISTRY.counter("inference_jobs_total", "Finished /picture/remove jobs", labels=("status",))
+
+
+# base64 yardımcıları: süre hem histograma hem o anki isteğin Server-Timing'ine ("b64") yazılır
+def b64encode(data):
+    with BASE64_SECONDS.time("b64", operation="encode"):
+        return base64.b64encode(data).decode("utf-8")
+
+def b64decode(text):
+    with BASE64_SECONDS.time("b64", operation="decode"):
+        return base64.b64decode(text)
+
+
+# ASGI middleware: her isteğin süresini handler (route fonksiyonu) etiketiyle ölçer. BaseHTTPMiddleware yerine düz ASGI,
+# çünkü akan (streaming) cevapları bozmuyor ve istek başına ek task açmıyor
+class MetricsMiddleware:
+    def __init__(self, app, server_timing=METRICS_SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = {}
+        token = request_timings.set(timings)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    timings["app"] = time.perf_counter() - start
+                    header = ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_timings.reset(token)
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", "unmatched") # route şablonu yerine fonksiyon adı: etiket sayısı sınırlı kalır
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"], handler=handler, status=str(status))
+
+
+# SQLAlchemy engine'e her SQL ifadesinin süresini ölçen dinleyiciler ekler
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.observe(elapsed, operation=operation)
+        add_request_timing("db", elapsed)
+
+
+# kuyruk derinlikleri ve önbellek sayaçları /metrics okunurken hesaplanır, sıcak yola maliyeti yok
+def register_gauges(job_queue, model_loader, mask_cache, auth_cache):
+    REGISTRY.gauge("inference_jobs_pending", "Jobs queued or running in the backend worker pool", fn=job_queue.pending)
+    REGISTRY.gauge("inference_batch_queue_depth", "Images waiting in the micro-batching scheduler", fn=model_loader.queue_depth)
+    REGISTRY.gauge("model_ready", "1 once the model is loaded and warmed up", fn=lambda: int(model_loader.stats()["ready"]))
+    for field in ("uss", "pss", "rss"):
+        REGISTRY.gauge(f"process_{field}_bytes", f"Worker process {field.upper()} from /proc/self/smaps_rollup",
+                       fn=lambda field=field: memory_usage()[field])
+    for name, cache in (("mask_cache", mask_cache), ("auth_cache", auth_cache)):
+        for field in ("hits", "misses"):
+            # sadece artan sayılar: counter olarak yayınlanır ki rate() ile okunabilsin
+            REGISTRY.counter(f"{name}_{field}_total", f"{name} {field} since start", fn=lambda cache=cache, field=field: cache.stats()[field])
@@ -0,0 +1,95 @@
+"""Modeli arka planda yükleyip ısıtan (warmup) yükleyici ve hazır olma (readiness) bayrağı"""
+
+import os
+import threading
+import time
+
+from ai.batching import BatchScheduler
+from ai.main import load_model, warmup
+from ai.timing import stage
+from ai.workers import memory_usage
+
+
+# sürecin başladığı an; açılıştan hazır olmaya/ilk cevaba kadar geçen süre buna göre ölçülür.
+# Linux'ta /proc'tan okunur ki import süreleri (torch, cv2) de ölçüme girsin; okunamazsa modülün yüklendiği an
+def _process_started_at():
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_STARTED_AT = _process_started_at()
+
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "1") == "1" # 0 -> model ilk iş geldiğinde yüklenir
+
+
+class ModelLoader:
+    """
+    start() modeli bir thread'de yükler, ısıtır ve BatchScheduler'ı kurar; bu sırada uygulama istek almaya devam eder.
+    get() model hazır olana kadar bekler. /ready, ready bayrağı kalkana kadar 503 döner ki trafik ısınmamış modele gitmesin.
+    """
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.error = None
+        self.timings = {}
+        self.first_result_seconds = None
+        self._scheduler = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+                self._thread.start()
+        return self
+
+    def get(self, timeout=None):
+        # yükleme başlatılmadıysa (MODEL_PRELOAD=0) ilk çağıran başlatır
+        self.start()
+        if not self.ready.wait(timeout):
+            raise TimeoutError("Model is still loading")
+        if self.error is not None:
+            raise RuntimeError(f"Model failed to load: {self.error}")
+        return self._scheduler
+
+    # hazırsa zamanlayıcı, değilse None (beklemeden)
+    def scheduler(self):
+        return self._scheduler if self.ready.is_set() else None
+
+    def queue_depth(self):
+        return self._scheduler.pending() if self._scheduler is not None else 0
+
+    def record_result(self):
+        if self.first_result_seconds is None:
+            self.first_result_seconds = time.time() - PROCESS_STARTED_AT
+
+    def stats(self):
+        return {
+            "ready": self.ready.is_set() and self.error is None,
+            "error": self.error,
+            "timings": {name: round(seconds, 3) for name, seconds in self.timings.items()},
+            "first_result_seconds": self.first_result_seconds,
+            "memory": memory_usage(), # bu worker'ın USS/PSS/RSS'i; paylaşılan ağırlıklar USS'e girmez
+        }
+
+    def _load(self):
+        try:
+            with stage(self.timings, "load"):
+                model = load_model()
+            warmup(model, timings=self.timings)
+            self._scheduler = BatchScheduler(model)
+            self.timings["ready"] = time.time() - PROCESS_STARTED_AT
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.ready.set()
+
+
+model_loader = ModelLoader()
@@ -1,13 +1,29 @@
 # imports
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from db.database import SessionLocal
+from db.database import get_db
 from db.tables import Pictures
 from typing import Annotated
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, defer
 from starlette import status
 from backend.auth import get_current_user
-import base64
+from backend.jobs import job_queue, QueueFullError, TooManyJobsError, QUEUED, RUNNING
+from backend.bulk import bulk_queue, collect_uploads
+from backend.picture_storage import save_picture_file, load_picture_bytes, release_blobs, KINDS
+from backend.blob_response import blob_response
+from backend.metrics import b64encode, b64decode
+from backend.thumbnails import ensure_thumbnail, THUMBNAIL_MEDIA_TYPE
+from ai.encoding import OUTPUT_FORMATS
+from ai.batching import INFERENCE_DEADLINE_MS
+from ai.main import ImageTooLargeError
+from db.blob_store import blob_store, BlobTooLargeError
+from PIL import UnidentifiedImageError
+import asyncio
+import json
+import zipfile
 
 router = APIRouter(
     prefix = "/picture",
@@ -19,59 +35,144 @@ class PictureRequest(BaseModel):
     original_image: str
     processed_image: str
 
-# connect db
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+MAX_THUMBNAILS_PER_REQUEST = 100
+HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 100
 
+# DB'ye dokunan route'lar `async def` değil düz `def`: FastAPI onları threadpool'da çalıştırır, böylece senkron
+# SQLAlchemy sorguları ve blob okumaları event loop'u bloklamaz ve diğer istekleri sıraya sokmaz
 db_dependency = Annotated[Session, Depends(get_db)]             # to let all functions inherite from get_db
 user_dependency = Annotated[Session, Depends(get_current_user)] # to let all functions inherite from get_current_user. bu resimleri kim kaydediyor ona bağla
 
+# keyset (cursor) pagination: ?before_id=&limit=. (user_id, id) index'i sayesinde sayfa ne kadar derinde olursa olsun maliyet aynı
 @router.get("/get-all")
-async def get_all(user:user_dependency, db:db_dependency):
+def get_all(user:user_dependency, db:db_dependency, before_id: int | None = None, limit: int = HISTORY_PAGE_SIZE, include_thumbnails: bool = False):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="You are not Authorized!")
     else:
-        all_entries = db.query(Pictures.id, Pictures.timestamp).filter(Pictures.user_id==user.id).order_by(Pictures.id.desc()).all()
-    return [{"id":entry.id, "date":entry.timestamp} for entry in all_entries]
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+        # eski kayıtların base64 sütunu sadece NULL mı diye bakılır, içeriği okunmaz (sayfa başına megabaytlar olabilir)
+        query = db.query(Pictures.id, Pictures.timestamp, Pictures.processed_ref,
+                         Pictures.processed_image.isnot(None).label("has_processed")).filter(Pictures.user_id==user.id)
+        if before_id is not None:
+            query = query.filter(Pictures.id < before_id)
+        all_entries = query.order_by(Pictures.id.desc()).limit(limit + 1).all() # bir fazlasını alıp sonraki sayfa var mı anlıyoruz
+        total = db.query(func.count(Pictures.id)).filter(Pictures.user_id==user.id).scalar() # sadece index'ten okunur
+
+    has_more = len(all_entries) > limit
+    all_entries = all_entries[:limit]
+
+    if not include_thumbnails:
+        items = [{"id":entry.id, "date":entry.timestamp} for entry in all_entries]
+    else:
+        # işlenmiş resim varsa onun, yoksa orijinalin önizlemesi gösterilir
+        items = [{"id":entry.id, "date":entry.timestamp,
+                  "thumbnail_url":f"{router.prefix}/thumbnail/{thumbnail_kind(entry)}/{entry.id}"} for entry in all_entries]
+
+    return {"items": items, "next_before_id": all_entries[-1].id if has_more else None, "total": total}
+
+def thumbnail_kind(entry):
+    return "processed" if entry.processed_ref is not None or entry.has_processed else "original"
 
 # show that original picture - bu sayfa history_detail_page'de gösterilecek
 @router.get("/get-original-picture/{picture_id}")
-async def get_original_picture(picture_id:int, db: db_dependency, user: user_dependency):
+def get_original_picture(picture_id:int, db: db_dependency, user: user_dependency):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="You are not Authorized!")
     else:
-        original_picture = db.query(Pictures.original_image).filter(Pictures.id == picture_id).filter(Pictures.user_id == user.id).first()
+        original_picture = db.query(Pictures.original_ref, Pictures.original_image).filter(Pictures.id == picture_id).filter(Pictures.user_id == user.id).first()
         if original_picture is not None:
-            return {"original_image":original_picture[0]}
+            image_bytes = load_picture_bytes(original_picture, "original")
+            return {"original_image":b64encode(image_bytes) if image_bytes is not None else None}
         else:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Picture not found")
 
 # show that processed picture - bu sayfa history_detail_page'de gösterilecek
 @router.get("/get-processed-picture/{picture_id}")
-async def get_processed_picture(picture_id: int, db: db_dependency, user: user_dependency):
+def get_processed_picture(picture_id: int, db: db_dependency, user: user_dependency):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="You are not Authorized!")
     else:
-        processed_image = db.query(Pictures.processed_image).filter(Pictures.id == picture_id).filter(Pictures.user_id == user.id).first()
+        processed_image = db.query(Pictures.processed_ref, Pictures.processed_image).filter(Pictures.id == picture_id).filter(Pictures.user_id == user.id).first()
         if processed_image is not None:
-            return {"processed_image":processed_image[0]}
+            image_bytes = load_picture_bytes(processed_image, "processed")
+            return {"processed_image":b64encode(image_bytes) if image_bytes is not None else None}
         else:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Picture not found")
 
+# resmin ham byte'larını döndürür (base64/JSON yok). ETag ile tekrar istenen resim 304 ile gövdesiz döner, Range desteklenir
+def picture_response(request, db, user, picture_id, kind):
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="You are not Authorized!")
+
+    ref_column, size_column, legacy_column = (getattr(Pictures, f"{kind}_ref"), getattr(Pictures, f"{kind}_size"), getattr(Pictures, f"{kind}_image"))
+    picture = db.query(ref_column, size_column, legacy_column).filter(Pictures.id == picture_id).filter(Pictures.user_id == user.id).first()
+    if picture is None or (picture[0] is None and picture[2] is None):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Picture not found")
+
+    if picture[0] is not None:
+        return blob_response(request, ref=picture[0], size=picture[1])
+    return blob_response(request, data=b64decode(picture[2])) # henüz migrate edilmemiş eski kayıt
+
+@router.get("/original/{picture_id}")
+def get_original_picture_binary(picture_id: int, request: Request, db: db_dependency, user: user_dependency):
+    return picture_response(request, db, user, picture_id, "original")
+
+@router.get("/processed/{picture_id}")
+def get_processed_picture_binary(picture_id: int, request: Request, db: db_dependency, user: user_dependency):
+    return picture_response(request, db, user, picture_id, "processed")
+
+# küçük WebP önizleme - ilk istekte oluşturulup kaydedilir, sonrakilerde ETag ile 304 döner
+@router.get("/thumbnail/{kind}/{picture_id}")
+def get_thumbnail(kind: str, picture_id: int, request: Request, db: db_dependency, user: user_dependency):
+    if kind not in KINDS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown picture kind")
+
+    # base64 sütunları yüklenmez; thumbnail'i olmayan, migrate edilmemiş bir kayıtta gerekirse ayrıca okunur
+    picture = db.query(Pictures).options(defer(Pictures.original_image), defer(Pictures.processed_image)) \
+        .filter(Pictures.id == picture_id).filter(Pictures.user_id == user.id).first()
+    ref = ensure_thumbnail(db, picture, kind) if picture is not None else None
+    if ref is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Picture not found")
+    return blob_response(request, ref=ref)
+
+# birden fazla thumbnail'i tek istekte döndürür: {id: base64 webp}. History sayfası bir ekranlık kaydı tek seferde alır
+@router.get("/thumbnails")
+def get_thumbnails(ids: str, db: db_dependency, user: user_dependency, kind: str = "processed"):
+    if kind not in KINDS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown picture kind")
+    try:
+        picture_ids = [int(picture_id) for picture_id in ids.split(",") if picture_id][:MAX_THUMBNAILS_PER_REQUEST]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be a comma separated list of integers")
+
+    thumbnails = {}
+    pictures = db.query(Pictures).options(defer(Pictures.original_image), defer(Pictures.processed_image)) \
+        .filter(Pictures.id.in_(picture_ids)).filter(Pictures.user_id == user.id).all()
+    for picture in pictures:
+        ref = ensure_thumbnail(db, picture, kind) or ensure_thumbnail(db, picture, "original")
+        if ref is not None:
+            thumbnails[picture.id] = b64encode(blob_store.get(ref))
+    return {"media_type": THUMBNAIL_MEDIA_TYPE, "thumbnails": thumbnails}
+
+# yüklenen dosyayı belleğe almadan blob store'a kopyalar; resim değilse 400, boyut/piksel sınırı aşılırsa 413
+# (route'lar threadpool'da çalıştığı için senkron okuma event loop'u bloklamaz)
+def store_upload(upload):
+    try:
+        return save_picture_file(upload.file)
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file is not an image")
+    except (ImageTooLargeError, BlobTooLargeError) as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
 # send original picture to db
 @router.post("/post-original-picture")
-async def post_original_picture(db: db_dependency, user: user_dependency, original_picture: UploadFile=File(...)):
-    original_picture = await original_picture.read() # Dosyayı oku ve Base64'e çevir
-    base64_string = base64.b64encode(original_picture).decode("utf-8") # convert binary data to base64
-
+def post_original_picture(db: db_dependency, user: user_dependency, original_picture: UploadFile=File(...)):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="You are not Authorized")
     else:
-        picture = Pictures(user_id=user.id, original_image=base64_string, processed_image=None)
+        original_ref, original_size = store_upload(original_picture) # blob store'a yaz, satırda sadece referans kalsın
+        picture = Pictures(user_id=user.id, original_ref=original_ref, original_size=original_size)
         db.add(picture)
         db.commit()
         db.refresh(picture)
@@ -80,30 +181,116 @@ async def post_original_picture(db: db_dependency, user: user_dependency, origin
 
 # send processed image to db - ai'ın arkaplanı kaldırdığı fotoyu db'ye yollaması zaman alacağından update ile yolluyoruz fotoyu. önce direkt orjinal fotoyu kaydediyoruz, ai return verince ise o kayıda gidip tekrar açıp null olan processed kısmını gelen image ile düzeltiyoruz
 @router.put("/post-processed-picture/{picture_id}")
-async def post_processed_picture(picture_id:int, user: user_dependency, db:db_dependency, processed_picture:UploadFile=File(...)):
-    
-    processed_picture = await processed_picture.read() # AI'ın return ettiği processed picture'ı oku ve Base64'e çevir
-    base64_string = base64.b64encode(processed_picture).decode("utf-8")
-    
+def post_processed_picture(picture_id:int, user: user_dependency, db:db_dependency, processed_picture:UploadFile=File(...)):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="You are not Authorized!")
     else:
-        processed_picture = db.query(Pictures).filter(Pictures.id == picture_id).filter(Pictures.user_id == user.id).first() # update the none processed entry in the latest row of our db with the ai's return
+        picture = db.query(Pictures).filter(Pictures.id == picture_id).filter(Pictures.user_id == user.id).first() # update the none processed entry in the latest row of our db with the ai's return
 
-        if processed_picture is None:
+        if picture is None:
             raise HTTPException(status_code=404, detail="Picture not found or you are not the owner")
 
-        processed_picture.processed_image = base64_string # fill the none with AI's return
+        old_refs = [picture.processed_ref, picture.processed_thumb_ref]
+        picture.processed_ref, picture.processed_size = store_upload(processed_picture) # fill the none with AI's return
+        picture.processed_image = None
+        picture.processed_thumb_ref = None # önizleme ilk istekte yeni resimden oluşturulacak
         db.commit()
+        release_blobs(db, old_refs)
 
     return {"status": "success", "id": picture_id}
 
 # delete manually and automatically(when all parts has been finished)
 @router.delete("/delete/{picture_id}") # history_page.py sayfasında delete butonuna basılınca bura devreye girecek
-async def delete_manually(picture_id:int, user:user_dependency, db:db_dependency):
+def delete_manually(picture_id:int, user:user_dependency, db:db_dependency):
     picture = db.query(Pictures).filter(Pictures.id==picture_id).filter(Pictures.user_id == user.id).first()
     if picture is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No entry such this!")
     else:
+        refs = [picture.original_ref, picture.processed_ref, picture.original_thumb_ref, picture.processed_thumb_ref]
         db.delete(picture)
-        db.commit()
\ No newline at end of file
+        db.commit()
+        release_blobs(db, refs) # aynı resmi başka bir kayıt da kullanıyorsa blob silinmez
+
+# kuyruk dolu / son süre tutmayacak (503) ya da kullanıcının çok işi var (429); Retry-After tahmini bekleme süresidir
+def overloaded_exception(error):
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS if isinstance(error, TooManyJobsError) else status.HTTP_503_SERVICE_UNAVAILABLE
+    return HTTPException(status_code=status_code, detail="Server is busy, please try again later",
+                         headers={"Retry-After": str(error.retry_after)})
+
+# resmi yükle, arkaplan kaldırma işini sunucudaki worker havuzuna sıraya koy ve job id döndür
+# output_format: png (varsayılan, OUTPUT_FORMAT), webp (kayıpsız) ya da mask (sadece siyah/beyaz maske)
+# deadline_ms: sonuç bu sürede gelmeyecekse iş hiç kabul edilmez (varsayılan INFERENCE_DEADLINE_MS)
+@router.post("/remove")
+async def remove_picture_background(user: user_dependency, picture: UploadFile=File(...),
+                                    output_format: str | None = None, deadline_ms: int = INFERENCE_DEADLINE_MS):
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="You are not Authorized!")
+    if output_format is not None and output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+
+    # yükleme diskten blob store'a kopyalanır, iş sadece ref'ini tutar: bekleyen işler resimleri bellekte tutmaz.
+    # İş kabul edilmez ya da başarısız olursa blob hemen silinmez (aynı içeriği yazan başka bir istek satırını henüz
+    # commit etmemiş olabilir); hiçbir satırın göstermediği blob retention süpürücüsünce grace süresinden sonra toplanır
+    original_ref, original_size = await run_in_threadpool(store_upload, picture)
+    try:
+        job = await run_in_threadpool(job_queue.submit, user.id, original_ref, original_size, output_format, deadline_ms) # önbellek kontrolü resmi decode ettiği için event loop'u bloklamasın
+    except QueueFullError as e:
+        raise overloaded_exception(e)
+    except OSError: # başlığı geçerli ama içeriği bozuk resim
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded image could not be decoded")
+    return job.to_dict()
+
+# işin durumunu sorgula - bittiğinde picture_id ile sonuç get-processed-picture'dan alınabilir
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, user: user_dependency):
+    job = job_queue.get(job_id, user.id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job.to_dict()
+
+# işin durumunu Server-Sent Events olarak akıt, iş bitince akış kapanır
+@router.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, user: user_dependency):
+    job = job_queue.get(job_id, user.id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    async def events():
+        last_status = None
+        while True:
+            if job.status != last_status:
+                last_status = job.status
+                yield f"data: {json.dumps(job.to_dict())}\n\n"
+            if job.status not in (QUEUED, RUNNING):
+                return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+# çok sayıda resmi tek istekte yükle: multipart "pictures" dosyaları ve/veya "archive" zip'i. Dosyalar diskte bekler,
+# satırlar tek transaction'da eklenir, arkaplanlar batch'ler halinde kaldırılır. Durum /bulk/{batch_id}'den sorgulanır
+@router.post("/bulk")
+def bulk_upload(user: user_dependency, db: db_dependency, pictures: list[UploadFile] = File(None),
+                archive: UploadFile = File(None), output_format: str | None = None):
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="You are not Authorized!")
+    if output_format is not None and output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+
+    try:
+        uploads = collect_uploads(pictures, archive)
+        batch = bulk_queue.submit(db, user.id, uploads, output_format)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="archive is not a valid zip file")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except QueueFullError as e:
+        raise overloaded_exception(e)
+    return batch.to_dict()
+
+@router.get("/bulk/{batch_id}")
+async def get_bulk(batch_id: str, user: user_dependency):
+    batch = bulk_queue.get(batch_id, user.id)
+    if batch is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch not found")
+    return batch.to_dict()
@@ -0,0 +1,59 @@
+"""Pictures satırları ile blob store arasındaki yardımcılar: resmi kaydet, oku ve artık kullanılmayanı sil"""
+
+import os
+
+from sqlalchemy import or_
+
+from ai.main import open_image
+from db.blob_store import blob_store, BLOB_RELEASE_GRACE_SECONDS
+from db.tables import Pictures
+from backend.metrics import BLOB_BYTES, b64decode
+
+KINDS = ("original", "processed")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024))) # yüklenen tek bir resmin en fazla boyutu
+
+
+# resmi blob store'a yazar, satıra konacak (ref, size) ikilisini döndürür
+def save_picture_bytes(data):
+    BLOB_BYTES.observe(len(data), operation="write")
+    return blob_store.put(data)
+
+# yüklenen dosyayı belleğe almadan, parça parça blob store'a yazar ve (ref, size) döndürür.
+# Önce sadece başlık okunur: resim değilse UnidentifiedImageError, piksel sayısı fazlaysa ImageTooLargeError;
+# dosya UPLOAD_MAX_BYTES'tan büyükse kopyalama sırasında BlobTooLargeError (ikisi de ValueError)
+def save_picture_file(fileobj, max_size=UPLOAD_MAX_BYTES):
+    start = fileobj.tell()
+    open_image(fileobj) # close() çağrılmaz: Pillow verilen dosya nesnesini de kapatıyor
+    fileobj.seek(start)
+    ref, size = blob_store.put_file(fileobj, max_size=max_size)
+    BLOB_BYTES.observe(size, operation="write")
+    return ref, size
+
+# satırdaki resmin byte'larını döndürür. Henüz migrate edilmemiş eski kayıtlar için base64 sütununa düşer
+def load_picture_bytes(picture, kind):
+    ref = getattr(picture, f"{kind}_ref")
+    if ref is not None:
+        data = blob_store.get(ref)
+        BLOB_BYTES.observe(len(data), operation="read")
+        return data
+
+    legacy = getattr(picture, f"{kind}_image")
+    if legacy is not None:
+        return b64decode(legacy)
+    return None
+
+def _referenced(db, ref):
+    return db.query(Pictures.id).filter(or_(Pictures.original_ref == ref, Pictures.processed_ref == ref,
+                                            Pictures.original_thumb_ref == ref, Pictures.processed_thumb_ref == ref)).first() is not None
+
+# satırlar silindikten (commit edildikten) sonra, başka hiçbir satırın göstermediği blob'ları siler; boşalan byte'ları döndürür.
+# Yeni yazılmış blob'lar (grace_seconds) silinmez: aynı içerik başka bir istekte yazılmış, satırı henüz commit edilmemiş olabilir
+def release_blobs(db, refs, grace_seconds=BLOB_RELEASE_GRACE_SECONDS):
+    freed = 0
+    for ref in set(refs):
+        if ref is None or not blob_store.exists(ref) or blob_store.age(ref) < grace_seconds:
+            continue
+        if not _referenced(db, ref):
+            freed += blob_store.size(ref)
+            blob_store.delete(ref)
+    return freed
@@ -0,0 +1,288 @@
+"""
+Saklama (retention) politikaları ve onları arka planda uygulayan süpürücü (sweeper).
+
+Politikalar (0 -> kapalı):
+    RETENTION_TTL_DAYS        bu kadar günden eski kayıtlar silinir
+    RETENTION_MAX_PER_USER    kullanıcı başına en yeni N kayıt tutulur, daha eskileri silinir
+    RETENTION_ORIGINALS_DAYS  bu kadar günden eski kayıtların orijinal resmi atılır, işlenmiş sonuç kalır
+
+Silme RETENTION_BATCH_SIZE satırlık kısa transaction'larla yapılır ve aralarda RETENTION_BATCH_PAUSE_MS beklenir;
+SQLite'ın yazma kilidi hiçbir zaman uzun süre tutulmaz, istekler parçaların arasına girer. Artık hiçbir satırın
+göstermediği blob'lar silinir; satırı hiç oluşmamış (başarısız/reddedilmiş /picture/remove yüklemeleri) ya da
+silindiği an BLOB_RELEASE_GRACE_SECONDS'tan genç olduğu için bırakılmış sahipsiz blob'lar da her süpürmede toplanır.
+Veritabanında boşalan sayfalar (auto_vacuum=INCREMENTAL ise) PRAGMA incremental_vacuum ile SQLITE_VACUUM_PAGES'lik
+adımlarla dosya sistemine geri verilir; tam VACUUM gibi bütün DB'yi kilitlemez.
+
+Kullanım:
+    python -m backend.retention                              # bir kere süpür (politika yoksa sadece sahipsiz blob'lar)
+    python -m backend.retention --dry-run                    # sadece kaç kaydın etkileneceğini say
+    python -m backend.retention --enable-incremental-vacuum  # eski bir DB'yi bir kereye mahsus dönüştür (tam VACUUM, kilitler)
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, or_
+
+from ai.metrics import REGISTRY
+from backend.picture_storage import release_blobs
+from db.blob_store import blob_store
+from db.database import SessionLocal, engine
+from db.tables import Pictures
+
+RETENTION_TTL_DAYS = float(os.getenv("RETENTION_TTL_DAYS", "0"))             # 0 -> kayıtlar süresiz saklanır
+RETENTION_MAX_PER_USER = int(os.getenv("RETENTION_MAX_PER_USER", "0"))       # 0 -> kullanıcı başına sınır yok
+RETENTION_ORIGINALS_DAYS = float(os.getenv("RETENTION_ORIGINALS_DAYS", "0")) # 0 -> orijinaller atılmaz
+RETENTION_SWEEP_INTERVAL_SECONDS = float(os.getenv("RETENTION_SWEEP_INTERVAL_SECONDS", "3600")) # 0 -> arka plan süpürücü çalışmaz
+                                                                                             # (politika olmasa da sahipsiz blob'ları toplar)
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "100"))         # bir transaction'da silinen en fazla satır
+RETENTION_BATCH_PAUSE_MS = int(os.getenv("RETENTION_BATCH_PAUSE_MS", "50"))  # parçalar arasında diğer yazanlara bırakılan süre
+SQLITE_VACUUM_PAGES = int(os.getenv("SQLITE_VACUUM_PAGES", "1000"))          # bir incremental_vacuum adımında geri verilen sayfa
+
+TTL, QUOTA, ORIGINALS = "ttl", "quota", "originals"
+
+DELETED = REGISTRY.counter("retention_rows_total", "Rows deleted (ttl, quota) or trimmed (originals) by the retention sweeper",
+                           labels=("policy",))
+RECLAIMED = REGISTRY.counter("retention_reclaimed_bytes_total", "Bytes given back by the retention sweeper", labels=("store",))
+
+
+class RetentionPolicy:
+    def __init__(self, ttl_days=RETENTION_TTL_DAYS, max_per_user=RETENTION_MAX_PER_USER, originals_days=RETENTION_ORIGINALS_DAYS):
+        self.ttl_days = ttl_days
+        self.max_per_user = max_per_user
+        self.originals_days = originals_days
+
+    @property
+    def enabled(self):
+        return bool(self.ttl_days or self.max_per_user or self.originals_days)
+
+
+class SweepReport:
+    def __init__(self):
+        self.rows = {TTL: 0, QUOTA: 0, ORIGINALS: 0}
+        self.blob_bytes = 0           # silinen blob dosyaları (sahipsizler dahil)
+        self.orphan_blobs = 0         # hiçbir satırın göstermediği için silinen blob sayısı
+        self.database_bytes = 0       # incremental_vacuum ile dosya sistemine geri verilen
+        self.database_free_bytes = 0  # DB dosyasında boş duran (yeni satırlar için tekrar kullanılacak) sayfalar
+        self.dry_run = False
+        self.seconds = 0.0
+
+    def to_dict(self):
+        return {"rows": dict(self.rows), "blob_bytes": self.blob_bytes, "orphan_blobs": self.orphan_blobs,
+                "database_bytes": self.database_bytes,
+                "database_free_bytes": self.database_free_bytes, "dry_run": self.dry_run, "seconds": round(self.seconds, 3)}
+
+
+# timestamp sütunu SQLite'ın CURRENT_TIMESTAMP'i: UTC, saat dilimi bilgisi olmadan
+def _cutoff(days):
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+
+
+def _has_original():
+    return or_(Pictures.original_ref.isnot(None), Pictures.original_image.isnot(None))
+
+def _has_processed():
+    return or_(Pictures.processed_ref.isnot(None), Pictures.processed_image.isnot(None))
+
+
+def _sqlite_pragma(conn, name):
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def enable_incremental_vacuum():
+    """
+    auto_vacuum sadece tablolar oluşturulmadan önce ya da tam VACUUM ile değiştirilebilir. Yeni veritabanları
+    db.database'de INCREMENTAL açılıyor; eski bir dosya için bu bir kere (bakım sırasında, DB kilitlenir) çalıştırılır.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        return _sqlite_pragma(conn, "auto_vacuum") == 2
+
+
+class RetentionSweeper:
+    def __init__(self, policy=None, batch_size=RETENTION_BATCH_SIZE, pause_ms=RETENTION_BATCH_PAUSE_MS,
+                 vacuum_pages=SQLITE_VACUUM_PAGES):
+        self.policy = policy or RetentionPolicy()
+        self.batch_size = batch_size
+        self.pause = pause_ms / 1000
+        self.vacuum_pages = vacuum_pages
+        self.last_report = None
+        self._lock = threading.Lock() # aynı anda tek süpürme
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, interval=RETENTION_SWEEP_INTERVAL_SECONDS):
+        if interval <= 0 or self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="retention-sweeper", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self, interval):
+        # ilk süpürme bir aralık sonra: açılışta model yüklenirken DB'ye ek yük bindirmesin
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"retention sweep failed: {e}")
+
+    def sweep(self, dry_run=False):
+        report = SweepReport()
+        report.dry_run = dry_run
+        start = time.perf_counter()
+        with self._lock:
+            if self.policy.ttl_days:
+                cutoff = _cutoff(self.policy.ttl_days)
+                self._delete(report, TTL, lambda db: db.query(Pictures.id).filter(Pictures.timestamp < cutoff), dry_run)
+            if self.policy.max_per_user:
+                for user_id, newest_kept in self._over_quota():
+                    self._delete(report, QUOTA, lambda db, user_id=user_id, newest_kept=newest_kept:
+                                 db.query(Pictures.id).filter(Pictures.user_id == user_id, Pictures.id < newest_kept), dry_run)
+            if self.policy.originals_days:
+                self._drop_originals(report, _cutoff(self.policy.originals_days), dry_run)
+            if not dry_run:
+                self._collect_orphans(report)
+                self._vacuum(report)
+        report.seconds = time.perf_counter() - start
+        self.last_report = report
+        return report
+
+    # sınırı aşan kullanıcılar ve tutulan en eski kaydın id'si; bundan küçük id'ler silinir.
+    # Sonradan eklenen kayıtların id'si hep daha büyük olduğu için sınır süpürme boyunca sabit kalır
+    def _over_quota(self):
+        db = SessionLocal()
+        try:
+            users = [row.user_id for row in db.query(Pictures.user_id).group_by(Pictures.user_id)
+                     .having(func.count(Pictures.id) > self.policy.max_per_user)]
+            return [(user_id, db.query(Pictures.id).filter(Pictures.user_id == user_id).order_by(Pictures.id.desc())
+                     .offset(self.policy.max_per_user - 1).limit(1).scalar()) for user_id in users]
+        finally:
+            db.close()
+
+    # query(db) silinecek satırların id sorgusu; her parça ayrı kısa bir transaction, aralarda kilit bırakılır
+    def _batches(self, query, dry_run):
+        last_id = 0
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                ids = [row.id for row in query(db).filter(Pictures.id > last_id).order_by(Pictures.id).limit(self.batch_size)]
+                if not ids:
+                    return
+                yield db, ids
+            finally:
+                db.close()
+            last_id = ids[-1] # dry run'da satırlar silinmediği için sonraki parça kaldığı yerden başlar
+            if not dry_run:
+                time.sleep(self.pause)
+
+    def _delete(self, report, policy, query, dry_run):
+        for db, ids in self._batches(query, dry_run):
+            report.rows[policy] += len(ids)
+            if dry_run:
+                continue
+            # sadece ref sütunları okunur; eski kayıtların base64 sütunları belleğe alınmaz
+            refs = [ref for row in db.query(Pictures.original_ref, Pictures.processed_ref, Pictures.original_thumb_ref,
+                                            Pictures.processed_thumb_ref).filter(Pictures.id.in_(ids)) for ref in row]
+            db.query(Pictures).filter(Pictures.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            self._release(report, db, refs)
+            DELETED.inc(len(ids), policy=policy)
+
+    # işlenmiş sonucu olan kayıtların orijinalini (ve önizlemesini) atar; işlenmemiş kayıtların tek resmi orijinal, dokunulmaz
+    def _drop_originals(self, report, cutoff, dry_run):
+        query = lambda db: db.query(Pictures.id).filter(Pictures.timestamp < cutoff, _has_original(), _has_processed())
+        for db, ids in self._batches(query, dry_run):
+            report.rows[ORIGINALS] += len(ids)
+            if dry_run:
+                continue
+            refs = [ref for row in db.query(Pictures.original_ref, Pictures.original_thumb_ref).filter(Pictures.id.in_(ids))
+                    for ref in row]
+            db.query(Pictures).filter(Pictures.id.in_(ids)).update(
+                {Pictures.original_ref: None, Pictures.original_size: None, Pictures.original_image: None,
+                 Pictures.original_thumb_ref: None}, synchronize_session=False)
+            db.commit()
+            self._release(report, db, refs)
+            DELETED.inc(len(ids), policy=ORIGINALS)
+
+    def _release(self, report, db, refs):
+        freed = release_blobs(db, refs) # aynı blob'u başka bir kayıt da gösteriyorsa silinmez
+        report.blob_bytes += freed
+        RECLAIMED.inc(freed, store="blobs")
+
+    # blob store'u parça parça tarar; hiçbir satırın göstermediği ve grace süresini doldurmuş blob'ları siler
+    def _collect_orphans(self, report):
+        columns = (Pictures.original_ref, Pictures.processed_ref, Pictures.original_thumb_ref, Pictures.processed_thumb_ref)
+        refs = blob_store.refs()
+        while not self._stop.is_set():
+            batch = [ref for _, ref in zip(range(self.batch_size), refs)]
+            if not batch:
+                return
+            db = SessionLocal()
+            try:
+                used = {row[0] for column in columns for row in db.query(column).filter(column.in_(batch))}
+                orphans = [ref for ref in batch if ref not in used]
+                if orphans:
+                    before = sum(1 for ref in orphans if blob_store.exists(ref))
+                    self._release(report, db, orphans) # grace ve referans kontrolü burada tekrar yapılır
+                    report.orphan_blobs += before - sum(1 for ref in orphans if blob_store.exists(ref))
+            finally:
+                db.close()
+
+    # boş sayfaları küçük adımlarla geri verir; her adım kısa bir yazma kilidi alır
+    def _vacuum(self, report):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            page_size = _sqlite_pragma(conn, "page_size")
+            pages_before = _sqlite_pragma(conn, "page_count")
+            if _sqlite_pragma(conn, "auto_vacuum") == 2:
+                # sqlite3'ün execute'u satır döndürmeyen ifadeyi tek adım (sqlite3_step) çalıştırır, bu da tek sayfa demek;
+                # fetchall da boş sonuçta adım atmıyor. executescript ifadeyi sonuna kadar çalıştırır: her çağrı vacuum_pages sayfa
+                cursor = conn.connection.driver_connection.cursor()
+                try:
+                    while not self._stop.is_set() and _sqlite_pragma(conn, "freelist_count") > 0:
+                        cursor.executescript(f"PRAGMA incremental_vacuum({self.vacuum_pages});")
+                        time.sleep(self.pause)
+                finally:
+                    cursor.close()
+                conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)") # küçülme WAL'dan ana dosyaya geçsin
+            report.database_bytes = (pages_before - _sqlite_pragma(conn, "page_count")) * page_size
+            report.database_free_bytes = _sqlite_pragma(conn, "freelist_count") * page_size
+        RECLAIMED.inc(report.database_bytes, store="database")
+
+
+retention_sweeper = RetentionSweeper()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the retention policies once, collect orphaned blobs and report the reclaimed space")
+    parser.add_argument("--dry-run", action="store_true", help="only count the rows each policy would touch (counted independently)")
+    parser.add_argument("--ttl-days", type=float, default=RETENTION_TTL_DAYS, help="delete pictures older than this (0: keep)")
+    parser.add_argument("--max-per-user", type=int, default=RETENTION_MAX_PER_USER, help="keep the newest N pictures per user (0: no limit)")
+    parser.add_argument("--originals-days", type=float, default=RETENTION_ORIGINALS_DAYS,
+                        help="drop originals of processed pictures older than this (0: keep)")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="switch an existing database to auto_vacuum=INCREMENTAL (runs a full VACUUM once)")
+    args = parser.parse_args()
+
+    if args.enable_incremental_vacuum:
+        print("incremental vacuum enabled" if enable_incremental_vacuum() else "could not enable incremental vacuum")
+        return
+
+    policy = RetentionPolicy(args.ttl_days, args.max_per_user, args.originals_days)
+    report = RetentionSweeper(policy).sweep(dry_run=args.dry_run)
+    print(json.dumps(report.to_dict()))
+    if report.database_free_bytes and not report.dry_run:
+        print("the database keeps freed pages for reuse; run with --enable-incremental-vacuum once to give them back to the filesystem")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""History listesinde tam boy resim yerine gösterilecek küçük WebP önizlemeler (thumbnail)"""
+
+import io
+import os
+
+from PIL import Image, ImageOps
+
+from backend.picture_storage import load_picture_bytes, save_picture_bytes
+from db.blob_store import blob_store
+
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "256"))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_MEDIA_TYPE = "image/webp"
+
+
+# resmi (byte'lar ya da dosya nesnesi) en uzun kenarı THUMBNAIL_SIZE olacak şekilde küçültüp WebP olarak döndürür.
+# Saydamlık (alfa) korunur, EXIF yönü uygulanır
+def make_thumbnail(source, size=THUMBNAIL_SIZE):
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    image.draft("RGB", (size, size)) # JPEG'lerde resmi tam çözmeden küçük boyutta okur, diğer formatlarda etkisizdir
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    image = ImageOps.exif_transpose(image)
+
+    buf = io.BytesIO()
+    image.save(buf, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+    return buf.getvalue()
+
+
+# thumbnail'i oluşturup blob store'a yazar ve satıra referansını koyar. Commit çağırana aittir
+def create_thumbnail(picture, kind, data=None):
+    if data is None:
+        ref = getattr(picture, f"{kind}_ref")
+        if ref is not None:
+            with blob_store.open(ref) as f: # resim belleğe alınmadan dosyadan okunur
+                return create_thumbnail(picture, kind, f)
+        data = load_picture_bytes(picture, kind)
+    if data is None:
+        return None
+    try:
+        thumbnail = make_thumbnail(data)
+    except OSError: # resim okunamıyorsa (bozuk/desteklenmeyen format) önizlemesiz devam
+        return None
+    ref, _ = save_picture_bytes(thumbnail)
+    setattr(picture, f"{kind}_thumb_ref", ref)
+    return ref
+
+
+# thumbnail yoksa ilk istekte oluşturup kalıcı olarak kaydeder (lazy), varsa direkt referansını döndürür
+def ensure_thumbnail(db, picture, kind):
+    ref = getattr(picture, f"{kind}_thumb_ref")
+    if ref is None:
+        ref = create_thumbnail(picture, kind)
+        if ref is not None:
+            db.commit()
+    return ref
@@ -0,0 +1,164 @@
+"""Resim dosyalarını (blob) veritabanı yerine içerik hash'i ile saklayan, değiştirilebilir (pluggable) depolama katmanı"""
+
+import hashlib
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "filesystem")
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "./blobs")
+CHUNK_SIZE = int(os.getenv("BLOB_CHUNK_SIZE", str(1024 * 1024))) # put_file'ın bir seferde okuyup yazdığı byte
+BLOB_RELEASE_GRACE_SECONDS = int(os.getenv("BLOB_RELEASE_GRACE_SECONDS", "3600")) # bu süreden yeni yazılmış/paylaşılmış blob silinmez
+
+
+# put_file'a verilen max_size aşıldı; o ana kadar yazılan geçici dosya silinir
+class BlobTooLargeError(ValueError):
+    pass
+
+
+class BlobStore(ABC):
+    """
+    Blob'lar içeriklerinin sha256 hash'i ile adreslenir (ref). Aynı içerik kaç kere yazılırsa yazılsın
+    (farklı kullanıcılar aynı resmi yüklese bile) bir kere saklanır.
+
+    Aynı içerik tekrar yazıldığında (dedup) blob'un yaşı sıfırlanır. Yazan tarafın satırı ancak sonra (ör. çıkarım
+    bitince) commit edildiği için o arada blob'u gösteren satır olmayabilir; BLOB_RELEASE_GRACE_SECONDS'tan genç
+    blob'lar bu yüzden silinmez (backend.picture_storage.release_blobs), sahipsiz kalanları süpürücü sonra toplar.
+    """
+
+    @abstractmethod
+    def put(self, data):
+        """bytes yazar, (ref, size) döndürür"""
+
+    @abstractmethod
+    def put_file(self, fileobj, max_size=None):
+        """Dosya benzeri nesneyi parça parça okuyarak yazar, (ref, size) döndürür. max_size aşılırsa BlobTooLargeError"""
+
+    @abstractmethod
+    def open(self, ref):
+        """Blob'u okumak için binary bir dosya nesnesi döndürür"""
+
+    def get(self, ref):
+        with self.open(ref) as f:
+            return f.read()
+
+    @abstractmethod
+    def size(self, ref):
+        pass
+
+    @abstractmethod
+    def exists(self, ref):
+        pass
+
+    @abstractmethod
+    def age(self, ref):
+        """Son yazılmasından (ya da dedup ile tekrar yazılmasından) bu yana geçen saniye"""
+
+    @abstractmethod
+    def refs(self):
+        """Saklanan bütün blob'ların ref'lerini sırayla üretir"""
+
+    @abstractmethod
+    def delete(self, ref):
+        pass
+
+
+class FileSystemBlobStore(BlobStore):
+    def __init__(self, root):
+        self.root = root
+        self._tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def path(self, ref):
+        # tek bir klasörde milyonlarca dosya olmasın diye ab/cd/abcd... şeklinde bölüyoruz
+        return os.path.join(self.root, ref[:2], ref[2:4], ref)
+
+    def put(self, data):
+        ref = hashlib.sha256(data).hexdigest()
+        if not self._touch(ref):
+            with tempfile.NamedTemporaryFile(dir=self._tmp_dir, delete=False) as tmp:
+                tmp.write(data)
+            self._commit(tmp.name, ref)
+        return ref, len(data)
+
+    def put_file(self, fileobj, max_size=None):
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=self._tmp_dir, delete=False) as tmp:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    break
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        if max_size is not None and size > max_size:
+            os.remove(tmp.name)
+            raise BlobTooLargeError(f"File is larger than {max_size} bytes")
+
+        ref = digest.hexdigest()
+        if self._touch(ref):
+            os.remove(tmp.name)
+        else:
+            self._commit(tmp.name, ref)
+        return ref, size
+
+    # blob varsa yaşını sıfırlar (mtime): henüz satırı yazılmamış bu yazma, başka bir kaydın silinmesiyle kaybolmasın
+    def _touch(self, ref):
+        try:
+            os.utime(self.path(ref))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _commit(self, tmp_path, ref):
+        path = self.path(ref)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path) # atomik: yarım yazılmış bir blob hiçbir zaman görünmez
+
+    def open(self, ref):
+        return open(self.path(ref), "rb")
+
+    def size(self, ref):
+        return os.path.getsize(self.path(ref))
+
+    def exists(self, ref):
+        return os.path.exists(self.path(ref))
+
+    def age(self, ref):
+        try:
+            return time.time() - os.path.getmtime(self.path(ref))
+        except FileNotFoundError: # arada silinmiş: silinecek bir şey yok, "yeni" say
+            return 0.0
+
+    def refs(self):
+        for root, dirs, files in os.walk(self.root):
+            if root == self.root:
+                dirs[:] = sorted(d for d in dirs if d != "tmp") # yarım yazılmış geçici dosyalar blob değil
+            else:
+                dirs.sort()
+            yield from sorted(files)
+
+    def delete(self, ref):
+        try:
+            os.remove(self.path(ref))
+        except FileNotFoundError:
+            pass
+
+
+_BACKENDS = {
+    "filesystem": lambda: FileSystemBlobStore(BLOB_STORE_DIR),
+}
+
+
+def get_blob_store():
+    if BLOB_STORE_BACKEND not in _BACKENDS:
+        raise ValueError(f"Unknown BLOB_STORE_BACKEND: {BLOB_STORE_BACKEND}")
+    return _BACKENDS[BLOB_STORE_BACKEND]()
+
+
+blob_store = get_blob_store()
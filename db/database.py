@@ -1,11 +1,44 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 SQLALCHEMY_DATABASE_URL = 'sqlite:///./database.db'
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={'check_same_thread':False, "timeout": 30})
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))          # sürekli açık tutulan bağlantı sayısı
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "30"))    # yoğunlukta geçici olarak açılabilecek ek bağlantı
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={'check_same_thread':False, "timeout": 30},
+                       pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+
+
+# SQLite'ı eşzamanlı (concurrent) okuma/yazma için ayarlıyoruz:
+# WAL -> okuyucular yazanı, yazan okuyucuları beklemez. synchronous=NORMAL -> WAL ile güvenli ve her commit'te fsync yok.
+# busy_timeout -> kilit varsa hata vermek yerine bekle. mmap -> okumalar sayfa kopyalamadan doğrudan hafızadan
+# auto_vacuum=INCREMENTAL -> silinen satırların sayfaları backend.retention tarafından küçük adımlarla geri verilir.
+# Sadece yeni (henüz tablo olmayan) veritabanlarında etkili; eskiler için: python -m backend.retention --enable-incremental-vacuum
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+    cursor.close()
+
+event.listen(engine, "connect", _configure_sqlite)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+# connect db - route'lara dependency olarak verilir
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+Base = declarative_base()
@@ -0,0 +1,71 @@
+"""
+Eski kayıtlardaki base64 resimleri blob store'a taşır.
+
+Kullanım:
+    python -m db.migrate_blobs --batch-size 50
+
+Tablonun tamamı hafızaya alınmaz: önce sadece id'ler parça parça (keyset) okunur, sonra her satırın
+base64 sütunu tek tek çekilip blob store'a yazılır ve her parça ayrı bir transaction'da commit edilir.
+Yarıda kesilirse tekrar çalıştırmak güvenlidir; taşınmış satırlar atlanır.
+"""
+
+import argparse
+import base64
+
+from sqlalchemy import or_
+
+from db.database import SessionLocal, engine, Base
+from db.blob_store import blob_store
+from db.migrations import run_migrations
+from db.tables import Pictures
+
+
+def migrate(batch_size=50):
+    migrated = 0
+    saved_bytes = 0
+    last_id = 0
+
+    while True:
+        db = SessionLocal()
+        try:
+            ids = [row.id for row in db.query(Pictures.id)
+                   .filter(Pictures.id > last_id)
+                   .filter(or_(Pictures.original_image.isnot(None), Pictures.processed_image.isnot(None)))
+                   .order_by(Pictures.id)
+                   .limit(batch_size)]
+            if not ids:
+                break
+
+            for picture_id in ids:
+                picture = db.query(Pictures).filter(Pictures.id == picture_id).first()
+                for kind in ("original", "processed"):
+                    legacy = getattr(picture, f"{kind}_image")
+                    if legacy is None:
+                        continue
+                    data = base64.b64decode(legacy)
+                    ref, size = blob_store.put(data)
+                    setattr(picture, f"{kind}_ref", ref)
+                    setattr(picture, f"{kind}_size", size)
+                    setattr(picture, f"{kind}_image", None)
+                    saved_bytes += len(legacy)
+                migrated += 1
+
+            db.commit()
+            last_id = ids[-1]
+            print(f"migrated {migrated} rows (up to id {last_id})")
+        finally:
+            db.close()
+
+    return migrated, saved_bytes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move base64 image columns into the blob store")
+    parser.add_argument("--batch-size", type=int, default=50, help="rows per transaction")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    migrated, saved_bytes = migrate(args.batch_size)
+    print(f"done: {migrated} rows migrated, {saved_bytes / 1024 / 1024:.1f} MB of base64 moved out of the database")
+    print("run VACUUM on database.db to give the freed pages back to the filesystem")
@@ -0,0 +1,35 @@
+"""create_all var olan tablolara sütun/index eklemediği için küçük, idempotent şema migration'ları"""
+
+from sqlalchemy import inspect, text
+
+# (tablo, sütun, SQL tipi)
+_COLUMNS = [
+    ("pictures", "original_ref", "VARCHAR(64)"),
+    ("pictures", "original_size", "INTEGER"),
+    ("pictures", "processed_ref", "VARCHAR(64)"),
+    ("pictures", "processed_size", "INTEGER"),
+    ("pictures", "original_thumb_ref", "VARCHAR(64)"),
+    ("pictures", "processed_thumb_ref", "VARCHAR(64)"),
+]
+
+# (index adı, tablo, sütunlar)
+_INDEXES = [
+    ("ix_pictures_user_id_id", "pictures", "user_id, id"),
+    ("ix_pictures_original_ref", "pictures", "original_ref"),
+    ("ix_pictures_processed_ref", "pictures", "processed_ref"),
+    ("ix_pictures_original_thumb_ref", "pictures", "original_thumb_ref"),
+    ("ix_pictures_processed_thumb_ref", "pictures", "processed_thumb_ref"),
+    ("ix_pictures_timestamp", "pictures", "timestamp"),
+]
+
+
+def run_migrations(engine):
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column, column_type in _COLUMNS:
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+
+        for name, table, columns in _INDEXES:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
@@ -1,5 +1,5 @@
 from db.database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Index
 from sqlalchemy.sql import func # tarihi otomatik eklemek için
 
 class Users(Base):
@@ -14,9 +14,18 @@ class Users(Base):
 
 class Pictures(Base):
     __tablename__ = "pictures"
+    __table_args__ = (
+        Index("ix_pictures_user_id_id", "user_id", "id"), # history sayfalaması: WHERE user_id = ? AND id < ? ORDER BY id DESC
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(ForeignKey("users.id"))
-    original_image  = Column(Text)
+    original_image  = Column(Text) # eski kayıtlar: base64 resim. Yeni kayıtlar resmi blob store'da tutar, burası boş kalır
     processed_image = Column(Text)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now()) # tarihin otomatik girilmesi adına
\ No newline at end of file
+    original_ref = Column(String(64), index=True)  # blob store'daki içeriğin sha256 hash'i
+    original_size = Column(Integer)
+    processed_ref = Column(String(64), index=True)
+    processed_size = Column(Integer)
+    original_thumb_ref = Column(String(64), index=True)  # history listesi için küçük WebP önizlemeler (blob store'da)
+    processed_thumb_ref = Column(String(64), index=True)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True) # tarihin otomatik girilmesi adına. Index: retention süpürmesi
\ No newline at end of file
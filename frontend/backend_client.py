@@ -0,0 +1,177 @@
+"""
+Streamlit sayfalarının backend ile konuştuğu ortak katman.
+
+Tüm istekler keep-alive bağlantı havuzu olan tek bir requests.Session'dan geçer (her çağrıda yeni TCP bağlantısı
+açılmaz), birbirinden bağımsız istekler (orijinal + işlenmiş resim) aynı anda atılır. İndirilen resimler ve history
+sayfaları oturum başına sınırlı bir önbellekte tutulur: FRONTEND_REVALIDATE_SECONDS içinde tekrar istenirse backend'e
+hiç gidilmez, sonrasında ETag ile sorulur ve değişmediyse gövdesiz 304 gelir. Böylece bir widget tıklamasıyla
+yeniden çalışan sayfa megabaytlarca resmi tekrar indirmez.
+"""
+
+import base64
+import io
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import cookiejar
+
+import requests
+import streamlit as st
+from PIL import Image
+from requests.adapters import HTTPAdapter
+
+API_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+FRONTEND_POOL_SIZE = int(os.getenv("FRONTEND_POOL_SIZE", "16"))                    # backend'e açık tutulan en fazla bağlantı
+FRONTEND_REVALIDATE_SECONDS = float(os.getenv("FRONTEND_REVALIDATE_SECONDS", "30")) # önbellekteki cevap bu süre boyunca sorulmadan kullanılır
+FRONTEND_TIMEOUT = float(os.getenv("FRONTEND_TIMEOUT", "30"))
+PICTURE_CACHE_SIZE = int(os.getenv("FRONTEND_PICTURE_CACHE_SIZE", "16"))   # oturum başına tutulan tam boy resim
+PAGE_CACHE_SIZE = 8                                                          # oturum başına tutulan history sayfası
+THUMBNAIL_CACHE_SIZE = 500
+
+
+# havuz bütün kullanıcıların oturumları arasında paylaşılıyor; bir cevabın Set-Cookie'si başka bir kullanıcının
+# isteğine karışmasın diye session hiçbir cookie saklamaz, token her istekte açıkça yollanır
+class _NoCookies(cookiejar.DefaultCookiePolicy):
+    def set_ok(self, cookie, request):
+        return False
+
+
+@st.cache_resource
+def _http():
+    session = requests.Session()
+    session.cookies.set_policy(_NoCookies())
+    adapter = HTTPAdapter(pool_connections=FRONTEND_POOL_SIZE, pool_maxsize=FRONTEND_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def _executor():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="backend-client")
+
+
+def cookies():
+    # Backend sadece cookie okuduğu için token'ı cookie formatında yolluyoruz
+    return {"access_token": st.session_state.get("access_token", "")}
+
+
+def request(method, path, **kwargs):
+    kwargs.setdefault("cookies", cookies())
+    kwargs.setdefault("timeout", FRONTEND_TIMEOUT)
+    return _http().request(method, f"{API_URL}{path}", **kwargs)
+
+
+def get(path, **kwargs):
+    return request("GET", path, **kwargs)
+
+def post(path, **kwargs):
+    return request("POST", path, **kwargs)
+
+def put(path, **kwargs):
+    return request("PUT", path, **kwargs)
+
+def delete(path, **kwargs):
+    return request("DELETE", path, **kwargs)
+
+
+# st.session_state'te tutulan önbellekler: sınır aşılınca en eski yazılan kayıt atılır
+def _session_cache(name):
+    return st.session_state.setdefault(name, OrderedDict())
+
+def _remember(cache, key, value, max_items):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_items:
+        cache.popitem(last=False)
+
+
+class Picture:
+    """İndirilmiş resim: ham byte'lar ve bir kere çıkarılan dosya tipi (her yeniden çalışmada Image.open yok)"""
+
+    def __init__(self, data, etag):
+        self.data = data
+        self.etag = etag
+        self.fetched_at = time.time()
+        image_format = Image.open(io.BytesIO(data)).format or "PNG" # sadece başlığı okur
+        self.mime = Image.MIME.get(image_format, "application/octet-stream")
+        self.extension = image_format.lower().replace("jpeg", "jpg")
+
+
+def fetch_pictures(picture_id, kinds=("original", "processed")):
+    """Bir kaydın resimlerini {kind: Picture ya da None} olarak döndürür; önbellekte taze olmayanlar aynı anda istenir"""
+    cache = _session_cache("picture_cache")
+    http, token, now = _http(), cookies(), time.time()
+
+    results, pending = {}, {}
+    for kind in kinds:
+        cached = cache.get((kind, picture_id))
+        if cached is not None and now - cached.fetched_at < FRONTEND_REVALIDATE_SECONDS:
+            results[kind] = cached
+            continue
+        # daha önce indirdiysek ETag'i yollarız; değişmediyse backend gövdesiz 304 döner.
+        # worker thread'lerde st.session_state'e erişilemediği için cookie ve başlıklar burada hazırlanıyor
+        headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else {}
+        pending[kind] = (cached, _executor().submit(http.get, f"{API_URL}/picture/{kind}/{picture_id}", cookies=token,
+                                                     headers=headers, timeout=FRONTEND_TIMEOUT))
+
+    for kind, (cached, future) in pending.items():
+        try:
+            response = future.result()
+        except requests.RequestException:
+            results[kind] = cached
+            continue
+        if response.status_code == 304 and cached is not None:
+            cached.fetched_at = time.time()
+            picture = cached
+        elif response.status_code == 200:
+            picture = Picture(response.content, response.headers.get("ETag"))
+        else:
+            cache.pop((kind, picture_id), None)
+            results[kind] = None
+            continue
+        _remember(cache, (kind, picture_id), picture, PICTURE_CACHE_SIZE)
+        results[kind] = picture
+    return results
+
+
+def fetch_history_page(before_id=None):
+    """/picture/get-all sayfası; aynı sayfa FRONTEND_REVALIDATE_SECONDS içinde tekrar istenmez. Hata olursa None"""
+    cache = _session_cache("history_pages")
+    cached = cache.get(before_id)
+    if cached is not None and time.time() - cached[0] < FRONTEND_REVALIDATE_SECONDS:
+        return cached[1]
+
+    response = get("/picture/get-all", params={"before_id": before_id} if before_id is not None else None)
+    if response.status_code != 200:
+        return None
+    page = response.json()
+    _remember(cache, before_id, (time.time(), page), PAGE_CACHE_SIZE)
+    return page
+
+
+def fetch_thumbnails(picture_ids):
+    """{id: webp byte'ları}; önizlemeler değişmediği için oturumda tutulur, sadece eksikler tek istekte alınır"""
+    cache = _session_cache("history_thumbnails")
+    missing = [str(picture_id) for picture_id in picture_ids if picture_id not in cache]
+    if missing:
+        response = get("/picture/thumbnails", params={"ids": ",".join(missing)})
+        if response.status_code == 200:
+            for picture_id, thumbnail in response.json()["thumbnails"].items():
+                _remember(cache, int(picture_id), base64.b64decode(thumbnail), THUMBNAIL_CACHE_SIZE) # base64 bir kere çözülür
+    return {picture_id: cache.get(picture_id) for picture_id in picture_ids}
+
+
+# yeni bir kayıt eklendiğinde ya da silindiğinde history sayfaları ve o kaydın resimleri tekrar alınmalı
+def invalidate_history(picture_id=None):
+    st.session_state.pop("history_pages", None)
+    if picture_id is not None:
+        for name in ("picture_cache", "history_thumbnails"):
+            cache = st.session_state.get(name, {})
+            for key in [key for key in cache if key == picture_id or (isinstance(key, tuple) and key[1] == picture_id)]:
+                cache.pop(key)
+
+
+def logout():
+    get("/auth/logout", allow_redirects=False)
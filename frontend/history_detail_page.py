@@ -1,13 +1,8 @@
 import streamlit as st
-import requests
-import base64
-import io
-from PIL import Image
-import os
+from frontend import backend_client
 
-def history_detail_page():
 
-    API_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+def history_detail_page():
 
     st.sidebar.header("Options")
     if st.sidebar.button("🏠 Main Page", use_container_width=True):
@@ -27,30 +22,20 @@ def history_detail_page():
 
     col1, col2 = st.columns([2,2])
 
-    my_cookies = {"access_token":st.session_state.get('access_token','')}
-
-    get_req_original = requests.get(f"{API_URL}/picture/get-original-picture/{generation_id}", cookies=my_cookies)
+    # iki resim aynı anda istenir; oturumda taze kopyası varsa hiç indirilmez, yoksa ETag ile sorulur (değişmediyse 304)
+    pictures = backend_client.fetch_pictures(generation_id)
+    image_original, image_processed = pictures["original"], pictures["processed"]
 
-    get_req_processed = requests.get(f"{API_URL}/picture/get-processed-picture/{generation_id}", cookies=my_cookies)
-
-    if get_req_original.status_code==200:
+    if image_original is not None:
         with col1:
-            original_base64 = get_req_original.json()["original_image"] # o id'nin original_image sütunundaki değeri
-            image_original = base64.b64decode(original_base64) # String -> Bytes
-            image1 = Image.open(io.BytesIO(image_original)) # Bytes -> Resim
-
             st.text("Before the Generation")
-            st.image(image1, caption="the Picture that You Uploaded", use_container_width=True)
+            st.image(image_original.data, caption="the Picture that You Uploaded", use_container_width=True) # byte'lar olduğu gibi, tekrar encode edilmeden
 
-            st.download_button(label="Download Image", data=image_original, file_name="original.png", mime="image/png", type="primary") 
+            st.download_button(label="Download Image", data=image_original.data, file_name=f"original.{image_original.extension}", mime=image_original.mime, type="primary") 
 
-    if get_req_processed.status_code==200:
+    if image_processed is not None:
         with col2:
-            processed_base64 = get_req_processed.json()["processed_image"] # o id'nin processed_image sütunundaki değeri
-            image_processed = base64.b64decode(processed_base64) # String -> Bytes
-            image2 = Image.open(io.BytesIO(image_processed)) # Bytes -> Resim
-
             st.text("After the Generation")
-            st.image(image2, caption="the Picture that You Uploaded", use_container_width=True)
+            st.image(image_processed.data, caption="the Picture that You Uploaded", use_container_width=True)
 
-            st.download_button(label="Download Image", data=image_processed, file_name="processed.png", mime="image/png", type="primary") 
\ No newline at end of file
+            st.download_button(label="Download Image", data=image_processed.data, file_name=f"processed.{image_processed.extension}", mime=image_processed.mime, type="primary") 
\ No newline at end of file
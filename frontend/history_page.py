@@ -1,12 +1,9 @@
 import streamlit as st
-import requests
 import time
 import extra_streamlit_components as stx 
-import os
+from frontend import backend_client
 
 def history_page():
-    API_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
-
     st.sidebar.header("Options")
 
     if st.sidebar.button("🏠 Main Page", use_container_width=True):
@@ -19,7 +16,7 @@ def history_page():
         
         # 2. Backend'e haber ver (Opsiyonel ama iyi olur)
         try:
-            requests.get(f"{API_URL}/auth/logout")
+            backend_client.logout()
             cookie_manager.delete("access_token")
             st.logout()
         except:
@@ -40,13 +37,20 @@ def history_page():
     st.header("History")
     st.text("You can find your previous generations here!")
 
-    my_cookie = {"access_token":st.session_state.get("access_token","")}
+    # ilk sayfa kısa bir süre önbellekten gelir (yeni üretim/silme önbelleği temizler), "Load more" ile gelen sayfalar oturumda saklanır
+    first_page = backend_client.fetch_history_page()
+
+    if first_page is not None:
+        history_list = first_page["items"]
 
-    # şimdilik örnek statik kayıtlar:
-    response_get = requests.get(f"{API_URL}/picture/get-all", cookies=my_cookie)
+        # "Load more" sayfaları, ilk yüklendiklerinde ilk sayfanın son kaydından (boundary) sonrasını tutar. İlk sayfa o zamandan
+        # beri kaydıysa (yeni üretim, başka sekme) boundary ile yeni son kayıt arasındakiler hiçbir yerde görünmezdi: baştan başla
+        more = st.session_state.get("history_more")
+        if more is None or not more["items"] or not history_list or history_list[-1]["id"] > more["boundary"]:
+            more = st.session_state["history_more"] = {"items": [], "boundary": None, "next_before_id": first_page["next_before_id"]}
 
-    if response_get.status_code==200:
-        history_list = response_get.json()
+        if history_list:
+            history_list = history_list + [item for item in more["items"] if item["id"] < history_list[-1]["id"]]
 
         if not history_list:
             st.title("Please Generate Image First!")
@@ -54,17 +58,29 @@ def history_page():
                     st.session_state.page = "go_to_removed_background_page"
                     st.rerun()
         else:
+            st.caption(f"Showing {len(history_list)} of {first_page['total']} generations")
+
+            # önizlemeler oturumda saklanır, sadece yeni gelen kayıtlarınki tek istekte alınır (kayıt başına birkaç KB)
+            thumbnails = backend_client.fetch_thumbnails([item["id"] for item in history_list])
+
             for item in history_list: # elimizdeki kayıtlar kadar kutu çiziyoz
                 with st.container(border=True): # container ve border=True ile etrafı çizgili şık bir kutu yapıyoruz
-                    col1, col2 = st.columns([4,1]) # kutuyu 4'e 1 oranında bölüyoruz
-                    
-                    with col1: # kutunun 4'lük kısmına kayıtın idsi ve tarihini yazıyoruz
+                    col0, col1, col2 = st.columns([1,3,1]) # kutuyu önizleme, bilgi ve detay olarak bölüyoruz
+
+                    with col0:
+                        thumbnail = thumbnails.get(item["id"])
+                        if thumbnail:
+                            st.image(thumbnail, use_container_width=True)
+
+                    with col1: # kutunun 3'lük kısmına kayıtın idsi ve tarihini yazıyoruz
                         st.write(f"Generation {item['id']}")
                         st.caption(f"Date: {item['date']}")
                         if st.button("Delete", key=f"delete_btn_{item['id']}"):
                             
-                            response_delete = requests.delete(f"{API_URL}/picture/delete/{item['id']}", cookies=my_cookie)
+                            response_delete = backend_client.delete(f"/picture/delete/{item['id']}")
                             if response_delete.status_code==200:
+                                more["items"] = [i for i in more["items"] if i["id"] != item["id"]]
+                                backend_client.invalidate_history(item["id"])
                                 st.success("Deleted successfully!")
                                 st.rerun()
                             else:
@@ -75,6 +91,16 @@ def history_page():
                             st.session_state.selected_generation_id = item["id"] # 1. Hangi resme tıklandığını hafızaya alıyoruz
                             st.session_state.page = "history_detail_page"        # 2. Sayfayı 'detail' olarak değiştiriyoruz
                             st.rerun()                                           # 3. Sayfayı yenile ki yeni sayfaya geçsin
+
+            # bir sonraki sayfayı son gösterilen kaydın id'sinden devam ederek (keyset) getir
+            if more["next_before_id"] is not None and st.button("Load more", use_container_width=True):
+                page = backend_client.fetch_history_page(before_id=history_list[-1]["id"])
+                if page is not None:
+                    if more["boundary"] is None:
+                        more["boundary"] = first_page["items"][-1]["id"]
+                    more["items"].extend(page["items"])
+                    more["next_before_id"] = page["next_before_id"]
+                    st.rerun()
     else:
         st.error("History Could not Uploaded!")
         history_list = []
\ No newline at end of file
@@ -1,18 +1,56 @@
 import streamlit as st
 from PIL import Image # Yüklenen resmi göstermek için Pillow kütüphanesine ihtiyacımız var
-import io
 import sys
 import os
-import requests 
 import time
 import extra_streamlit_components as stx 
-from ai.main import remove_background, load_model
+from ai.main import load_model, warmup
+from ai.batching import BatchScheduler, Overloaded
+from ai.encoding import encode_image, EncodedImage, OUTPUT_FORMAT
+from frontend import backend_client
+
+# kullanıcıya gösterilen çıktı formatı seçenekleri -> encode_image formatı
+FORMAT_OPTIONS = {"PNG": "png", "WebP (lossless)": "webp", "Mask only": "mask"}
+
+# 1 ise model Streamlit'te değil backend'deki worker havuzunda çalışır (/picture/remove)
+SERVER_SIDE_INFERENCE = os.getenv("SERVER_SIDE_INFERENCE", "0") == "1"
+JOB_POLL_INTERVAL = 0.5
+JOB_TIMEOUT = 120
+
+
+# Resmi backend'e tek istekte yollar, iş bitene kadar durumunu sorgular ve işlenmiş resmin byte'larını döndürür
+def remove_background_on_server(image_bytes, output_format):
+    res = backend_client.post("/picture/remove", files={"picture": image_bytes}, params={"output_format": output_format})
+    if res.status_code == 401:
+        st.error("You are not Authorized! Please login again.")
+        return None
+    if res.status_code in (429, 503):
+        st.warning(f"The server is busy, please try again in {res.headers.get('Retry-After', 'a few')} seconds.")
+        return None
+    if res.status_code != 200:
+        st.error(f"Error: {res.text}")
+        return None
+
+    job_id = res.json()["job_id"]
+    deadline = time.time() + JOB_TIMEOUT
+    while time.time() < deadline:
+        job = backend_client.get(f"/picture/jobs/{job_id}").json() # havuzdaki aynı bağlantı tekrar kullanılır
+        if job["status"] == "done":
+            res_proc = backend_client.get(f"/picture/processed/{job['picture_id']}")
+            media_type = res_proc.headers.get("content-type", "image/png")
+            # backend'in encode ettiği byte'lar olduğu gibi gösterilir ve indirilir, decode/encode edilmez
+            return EncodedImage(res_proc.content, media_type, "webp" if media_type == "image/webp" else "png")
+        if job["status"] == "failed":
+            st.error(f"Error: {job['error']}")
+            return None
+        time.sleep(JOB_POLL_INTERVAL)
+
+    st.error("The server took too long, please try again.")
+    return None
 
 
 def removed_background_page():
 
-    API_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
-    
     current_dir = os.path.dirname(os.path.abspath(__file__)) # şuanki dosyanın yeri
     parent_dir = os.path.dirname(current_dir) # bir üst klasör (2_DEEPLABV3+.....)
     sys.path.append(parent_dir)               # python'a bu yolu ekle
@@ -20,11 +58,23 @@ def removed_background_page():
     # Bu fonksiyon uygulamada sadece 1 kez çalışır. Sonraki tıklamalarda hafızadan gelir. Hızın sırrı burada!
     @st.cache_resource
     def get_cached_model():
-        return load_model()
+        model = load_model()
+        warmup(model) # ilk kullanıcı ilk forward pass'lerin yavaşlığını yaşamasın
+        return model
+
+    # Tüm Streamlit oturumları aynı zamanlayıcıyı paylaşır; aynı anda gelen istekler tek forward pass'te işlenir
+    @st.cache_resource
+    def get_cached_scheduler():
+        return BatchScheduler(get_cached_model())
 
-    model = get_cached_model() # Modeli hafızadan çekiyoruz (Süresi: 0.00 sn)
+    if not SERVER_SIDE_INFERENCE:
+        scheduler = get_cached_scheduler() # Modeli ve zamanlayıcıyı hafızadan çekiyoruz (Süresi: 0.00 sn)
 
     st.sidebar.header("Options")
+    format_labels = list(FORMAT_OPTIONS)
+    format_label = st.sidebar.selectbox("Output format", format_labels, index=list(FORMAT_OPTIONS.values()).index(OUTPUT_FORMAT))
+    output_format = FORMAT_OPTIONS[format_label]
+
     if st.sidebar.button("🕒 History", use_container_width=True):
         st.session_state.page = "go_to_history_page"
         st.rerun()
@@ -36,7 +86,7 @@ def removed_background_page():
         
         # 2. Backend'e haber ver (Opsiyonel ama iyi olur)
         try:
-            requests.get(f"{API_URL}/auth/logout")
+            backend_client.logout()
             cookie_manager.delete("access_token")
             st.logout()
         except:
@@ -61,14 +111,15 @@ def removed_background_page():
     
     uploaded_file = st.file_uploader("Upload", type=["jpg", "jpeg", "png"])
 
-    # İşlenmiş resmi hafızada tutmak için session state kullanıyoruz
+    # İşlenmiş resmi hafızada tutmak için session state kullanıyoruz. Resim bir kere encode edilir (EncodedImage);
+    # aynı byte'lar backend'e kayıt, ekranda gösterme ve indirme için kullanılır
     if "processed_image" not in st.session_state:
         st.session_state.processed_image = None
 
     if uploaded_file is not None:
         try:
-            image = Image.open(uploaded_file) # uploaded_file'ı bir Image nesnesine dönüştür
-            st.image(image, caption="the Picture that You Uploaded", use_container_width=True) # Resmi göster
+            Image.open(uploaded_file) # resim mi diye kontrol et (sadece başlığı okur, decode etmez)
+            st.image(uploaded_file.getvalue(), caption="the Picture that You Uploaded", use_container_width=True) # Resmi yüklenen byte'larıyla göster
             st.success("Picture uploaded succesfully!")
         except Exception as e:
             st.error(f"Error: {e}")
@@ -78,56 +129,70 @@ def removed_background_page():
             # DÖNME ANİMASYONU (SPINNER)
             with st.spinner("Please wait, AI is working...."): 
 
-                # Backend Bağlantı Ayarları: Backend sadece cookie okuduğu için token'ı cookie formatında yolluyoruz.
-                my_cookies = {"access_token": st.session_state.get('access_token', '')}
-            
                 try:
-                    # --- 1. ADIM: Orijinal Resmi Backend'e Gönder (POST) ---
-                    uploaded_file.seek(0) # Dosyayı başa sar
-                    files_orig = {"original_picture": uploaded_file.getvalue()}
+                    if SERVER_SIDE_INFERENCE:
+                        # Orijinal resmi yolla, backend hem modeli çalıştırır hem iki resmi birlikte kaydeder
+                        result = remove_background_on_server(uploaded_file.getvalue(), output_format)
+                        if result is not None:
+                            st.session_state.processed_image = result
+                            backend_client.invalidate_history() # yeni kayıt history'de görünsün
+                            st.success("Your Picture is ready!")
+                    else:
+                        # --- 1. ADIM: AI İşini Sıraya Koy (Streamlit tarafında) ---
+                        # kabul kontrolü yüklemeden önce: geri çevrilen istek history'de işlenmemiş bir kayıt bırakmasın.
+                        # Kabul edilirse model çalışırken orijinal resim backend'e yüklenir
+                        uploaded_file.seek(0)
+                        future = scheduler.submit(uploaded_file)
+                        if future.done() and isinstance(future.exception(), Overloaded):
+                            raise future.exception()
+
+                        # --- 2. ADIM: Orijinal Resmi Backend'e Gönder (POST) ---
+                        files_orig = {"original_picture": uploaded_file.getvalue()}
                     
-                    # Backend'e istek atıyoruz (Resmi kaydet)
-                    res_orig = requests.post(f"{API_URL}/picture/post-original-picture", files=files_orig, cookies=my_cookies)
+                        # Backend'e istek atıyoruz (Resmi kaydet)
+                        res_orig = backend_client.post("/picture/post-original-picture", files=files_orig)
                     
-                    if res_orig.status_code == 200:
-                        picture_id = res_orig.json()['id'] # Backend'den gelen ID'yi kaptık!
+                        if res_orig.status_code == 200:
+                            picture_id = res_orig.json()['id'] # Backend'den gelen ID'yi kaptık!
+
+                            try:
+                                result_image = future.result()
+                            except Overloaded:
+                                # sırada beklerken son süresi doldu: az önce oluşturulan kaydı geri al
+                                backend_client.delete(f"/picture/delete/{picture_id}")
+                                raise
+
+                            # arkaplanı kaldırılmış resmi seçilen formatta bir kere encode edip session'da ki processed_image değişkenine eşitle
+                            result = encode_image(result_image, output_format)
+                            st.session_state.processed_image = result
+
+                            # --- 3. ADIM: İşlenmiş Resmi Backend'e Güncelle (PUT) ---
+                            files_proc = {"processed_picture": result.data}
                         
-                        # --- 2. ADIM: AI İşlemini Yap (Streamlit tarafında) ---
-                        uploaded_file.seek(0) # AI okuması için tekrar başa sar
-                        result_image = remove_background(model, uploaded_file)
+                            # ID'yi kullanarak veritabanındaki boş kısmı dolduruyoruz
+                            backend_client.put(f"/picture/post-processed-picture/{picture_id}", files=files_proc)
+                            backend_client.invalidate_history() # yeni kayıt history'de görünsün
                         
-                        # arkaplanı kaldırılmış resmi session'da ki processed_image değişkenine eşitle
-                        st.session_state.processed_image = result_image 
-
-                        # --- 3. ADIM: İşlenmiş Resmi Backend'e Güncelle (PUT) ---
-                        # Backend'e göndermek için resmi byte formatına çeviriyoruz
-                        buf_for_db = io.BytesIO()
-                        result_image.save(buf_for_db, format="PNG")
-                        files_proc = {"processed_picture": buf_for_db.getvalue()}
-                        
-                        # ID'yi kullanarak veritabanındaki boş kısmı dolduruyoruz
-                        requests.put(f"{API_URL}/picture/post-processed-picture/{picture_id}", files=files_proc, cookies=my_cookies)
-                        
-                        st.success("Your Picture is ready!")
+                            st.success("Your Picture is ready!")
                     
-                    elif res_orig.status_code == 401:
-                        st.error("You are not Authorized! Please login again.")
-                    else:
-                        st.error(f"Error saving to DB: {res_orig.text}")
-
+                        elif res_orig.status_code == 401:
+                            st.error("You are not Authorized! Please login again.")
+                        else:
+                            st.error(f"Error saving to DB: {res_orig.text}")
+
+                except Overloaded as e:
+                    # aynı anda çok kişi çalıştırıyor; herkesin zaman aşımına uğraması yerine bu istek hemen geri çevrildi
+                    st.warning(f"The server is busy, please try again in {e.retry_after} seconds.")
                 except Exception as e:
                     st.error(f"Connection Error: {e}")
 
         # eğer arkaplanı kaldırılmış değişken mevcutsa resmi göster ve indir
         if st.session_state.processed_image is not None: 
-            st.image(st.session_state.processed_image, caption="Background Removed Picture", use_container_width=True) # arkaplanı kaldırılmış resmi göster
-            
-            buf = io.BytesIO() # Resmi indirmek için resmi BytesIO'ya çevirmemiz gerek                                       
-            st.session_state.processed_image.save(buf, format="PNG") # Resmin formatını koruyarak (veya PNG olarak) kaydet
-            byte_im = buf.getvalue()
+            result = st.session_state.processed_image
+            st.image(result.data, caption="Background Removed Picture", use_container_width=True) # arkaplanı kaldırılmış resmi (encode edilmiş byte'ları) göster
 
-            # indir butonunun içeriği
-            st.download_button(label="Download Image", data=byte_im, file_name="background_removed.png", mime="image/png", type="primary") 
+            # indir butonunun içeriği - tekrar encode etmeden aynı byte'lar
+            st.download_button(label="Download Image", data=result.data, file_name=f"background_removed.{result.extension}", mime=result.media_type, type="primary") 
 
         else:
             st.text("Upload the File First!")
\ No newline at end of file
@@ -1,22 +1,74 @@
 """burada fastapi routerlarını toplayacağız bir de diğer main işlemleri"""
 from fastapi import FastAPI, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.middleware.sessions import SessionMiddleware
 from db.database import engine, Base
+from db.migrations import run_migrations
 from backend.auth import router as auth_router, get_current_user
 from backend.picture_operations import router as picture_router
+from backend.model_loader import model_loader, MODEL_PRELOAD
+from backend.jobs import job_queue
+from backend.auth_cache import auth_cache
+from backend.metrics import MetricsMiddleware, instrument_engine, register_gauges
+from backend.retention import retention_sweeper
+from ai.cache import mask_cache
+from ai.metrics import REGISTRY
 from db.tables import Users
 import os
+import anyio
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# düz `def` route'ların ve DB işlerinin çalıştığı threadpool; DB_POOL_SIZE + DB_MAX_OVERFLOW ile uyumlu olmalı
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+
 app = FastAPI()
 
+@app.on_event("startup")
+async def configure_threadpool():
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+# model arka planda yüklenip ısınırken uygulama ayağa kalkar; trafik /ready 200 dönünce yönlendirilmeli
+@app.on_event("startup")
+async def preload_model():
+    if MODEL_PRELOAD:
+        model_loader.start()
+
+# RETENTION_* politikalarına göre eski kayıtları küçük parçalar halinde siler ve sahipsiz blob'ları toplar
+@app.on_event("startup")
+async def start_retention_sweeper():
+    retention_sweeper.start()
+
+@app.on_event("shutdown")
+async def stop_retention_sweeper():
+    retention_sweeper.stop()
+
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY"))
+app.add_middleware(MetricsMiddleware) # istek süreleri ve (METRICS_SERVER_TIMING=1 ise) Server-Timing başlığı
+
+instrument_engine(engine) # SQL sorgu süreleri
+register_gauges(job_queue, model_loader, mask_cache, auth_cache)
 
 app.include_router(auth_router)
 app.include_router(picture_router)
 
+# liveness: süreç ayakta mı
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+# readiness: model yüklenip ısındı mı. Yükleme/ısınma süreleri de burada ölçülebilir
+@app.get("/ready")
+def ready():
+    stats = model_loader.stats()
+    return JSONResponse(stats, status_code=200 if stats["ready"] else 503)
+
+# Prometheus metin formatında metrikler: istek/SQL/base64/çıkarım süreleri, blob boyutları, kuyruk derinlikleri
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/test-user")
 def read_current_user(user: Users = Depends(get_current_user)):
     return {
@@ -28,4 +80,5 @@ def read_current_user(user: Users = Depends(get_current_user)):
 
 # --- TABLOLARI OLUŞTURMA KODU ---
 # Bu komut çalıştığında Users ve Pictures, veritabanında tabloya dönüştürür.
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+Base.metadata.create_all(bind=engine)
+run_migrations(engine) # var olan tablolara yeni sütun ve index'leri ekler